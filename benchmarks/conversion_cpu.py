@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+    Measure the CPU cost of OpenOB's audio conversion stage.
+
+    Pushes a fixed amount of stereo audio, as fast as possible, through the
+    conversion chain OpenOB used to insert unconditionally (audioresample at
+    quality 9 plus audioconvert) and through the chain OpenOB's own
+    negotiation (conversions_needed() and build_resampler()) now builds, for
+    some common input/encoder combinations and resampler settings. Reports
+    process CPU time per second of audio. Needs GStreamer; run from the repository root:
+
+        python benchmarks/conversion_cpu.py [-s 60] [-n 3]
+"""
+
+import argparse
+import collections
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openob.rtp.conversion import build_resampler, conversions_needed, describe_conversion
+
+PREVIOUS = 'audioresample quality=9 ! audioconvert'
+OPUS_CAPS = 'audio/x-raw,format=S16LE,layout=interleaved,rate=48000,channels=2'
+L16_CAPS = 'audio/x-raw,format=S16BE,layout=interleaved,rate=48000,channels=2'
+
+# The resampler settings of a link, as build_resampler() reads them
+ResamplerSettings = collections.namedtuple('ResamplerSettings', ['resample_quality', 'resample_method'])
+DEFAULT_RESAMPLER = ResamplerSettings(9, 'kaiser')
+
+# (description, input caps, encoder caps, [(chain, resampler settings)]);
+# the previous chain is used where there are no settings, otherwise the one
+# OpenOB's negotiation builds with them
+CASES = [
+    ('S16LE 48kHz in, Opus', OPUS_CAPS, OPUS_CAPS, [
+        ('previous', None),
+        ('fast path', DEFAULT_RESAMPLER),
+    ]),
+    ('S16LE 48kHz in, PCM', OPUS_CAPS, L16_CAPS, [
+        ('previous', None),
+        ('fast path', DEFAULT_RESAMPLER),
+    ]),
+    ('F32LE 48kHz in (JACK), Opus', OPUS_CAPS.replace('S16LE', 'F32LE'), OPUS_CAPS, [
+        ('previous', None),
+        ('fast path', DEFAULT_RESAMPLER),
+    ]),
+    ('S16LE 44.1kHz in, Opus', OPUS_CAPS.replace('48000', '44100'), OPUS_CAPS, [
+        ('previous', None),
+        ('quality 9, kaiser', ResamplerSettings(9, 'kaiser')),
+        ('quality 4, kaiser', ResamplerSettings(4, 'kaiser')),
+        ('quality 0, kaiser', ResamplerSettings(0, 'kaiser')),
+        ('quality 4, cubic', ResamplerSettings(4, 'cubic')),
+        ('linear', ResamplerSettings(4, 'linear')),
+    ]),
+]
+
+
+def build_chain(Gst, input_caps, output_caps, settings):
+    """
+        Return the conversion elements for a case, and a description of
+        them: the previous fixed chain if settings is None, otherwise what
+        OpenOB now builds between an input and encoder with these caps.
+    """
+    if settings is None:
+        return [Gst.parse_bin_from_description(PREVIOUS, True)], 'previous chain'
+    resample, convert = conversions_needed(Gst.Caps.from_string(input_caps), Gst.Caps.from_string(output_caps))
+    elements = []
+    if resample:
+        elements.append(build_resampler(settings))
+    if convert:
+        elements.append(Gst.ElementFactory.make('audioconvert'))
+    return elements, describe_conversion(resample, convert)
+
+
+def measure(Gst, input_caps, output_caps, chain, seconds):
+    """Return the process CPU time (s) spent converting seconds of audio through chain"""
+    rate = Gst.Caps.from_string(input_caps).get_structure(0).get_value('rate')
+    samples = rate // 50
+    description = 'audiotestsrc wave=pink-noise samplesperbuffer=%i num-buffers=%i ! %s ! identity name=input ' \
+        'identity name=output ! %s ! fakesink' % (samples, seconds * 50, input_caps, output_caps)
+    pipeline = Gst.parse_launch(description)
+    elements = [pipeline.get_by_name('input')] + chain + [pipeline.get_by_name('output')]
+    for element in chain:
+        pipeline.add(element)
+    for upstream, downstream in zip(elements, elements[1:]):
+        upstream.link(downstream)
+    start = os.times()
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    end = os.times()
+    pipeline.set_state(Gst.State.NULL)
+    if message.type == Gst.MessageType.ERROR:
+        raise RuntimeError('%s: %s' % (description, message.parse_error()[0].message))
+    return (end[0] + end[1]) - (start[0] + start[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--seconds', type=int, default=60, help="Seconds of audio to convert per run")
+    parser.add_argument('-n', '--runs', type=int, default=3, help="Runs per case; the fastest is reported")
+    opts = parser.parse_args()
+
+    from openob.gstreamer import Gst
+    # Subtract the cost of generating the audio itself
+    baselines = {}
+
+    print('%-30s %-20s %-26s %12s %10s' % ('case', 'conversion', 'chain', 'CPU ms/s', '% of core'))
+    for description, input_caps, output_caps, chains in CASES:
+        if input_caps not in baselines:
+            baselines[input_caps] = min(measure(Gst, input_caps, input_caps, [], opts.seconds) for _ in range(opts.runs))
+        for name, settings in chains:
+            timings = []
+            for _ in range(opts.runs):
+                # Elements can't be reused once their pipeline is freed
+                chain, chain_description = build_chain(Gst, input_caps, output_caps, settings)
+                timings.append(measure(Gst, input_caps, output_caps, chain, opts.seconds))
+            per_second = max(min(timings) - baselines[input_caps], 0.0) / opts.seconds
+            print('%-30s %-20s %-26s %12.2f %10.3f' % (
+                description, name, chain_description, per_second * 1000, per_second * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+"""
+    Network impairment harness for OpenOB links.
+
+    Runs a transmitter and receiver on localhost with a UDP proxy between
+    them which drops (randomly or in bursts), delays, jitters, reorders and
+    duplicates packets. The transmitter sends a test tone; for each scenario
+    the received audio is compared against it and the jitter buffer's view
+    of the stream is reported, so link settings (Opus FEC, expected loss,
+    jitter buffer size) can be chosen from data.
+
+    Needs GStreamer and a redis server on the configuration host (by default
+    localhost), as for a normal link. Run from the repository root:
+
+        python benchmarks/impairment.py [--encoding opus] [--fec] [-l 5] [-j 60]
+
+    The proxy can also be run on its own to impair a real link:
+
+        python benchmarks/impairment.py proxy 3000 127.0.0.1 3002 --loss 2 --jitter 10
+"""
+
+import argparse
+import array
+import heapq
+import logging
+import math
+import os
+import random
+import select
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openob.logger import LoggerFactory
+
+
+class GilbertElliott(object):
+
+    """
+        Two-state packet loss model. In the good state packets are lost with
+        probability loss_good, in the bad state with probability loss_bad;
+        p is the chance of moving good -> bad per packet and r bad -> good.
+        With p = 0 this is plain random loss at loss_good.
+    """
+
+    def __init__(self, p=0.0, r=1.0, loss_good=0.0, loss_bad=1.0, rng=random):
+        self.p = p
+        self.r = r
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.rng = rng
+        self.bad = False
+
+    def lose(self):
+        if self.bad:
+            if self.rng.random() < self.r:
+                self.bad = False
+        elif self.rng.random() < self.p:
+            self.bad = True
+        return self.rng.random() < (self.loss_bad if self.bad else self.loss_good)
+
+
+class ImpairmentProxy(object):
+
+    """
+        Forwards UDP datagrams from listen_port to (host, port), impairing
+        them on the way. Delays and jitter are in milliseconds; reorder and
+        duplicate are probabilities per packet.
+    """
+
+    def __init__(self, listen_port, host, port, loss_model=None, delay=0.0, jitter=0.0,
+                 reorder=0.0, duplicate=0.0, seed=None):
+        self.destination = (host, port)
+        self.loss_model = loss_model or GilbertElliott()
+        self.delay = delay / 1000.0
+        self.jitter = jitter / 1000.0
+        self.reorder = reorder
+        self.duplicate = duplicate
+        self.rng = random.Random(seed)
+        self.loss_model.rng = self.rng
+        self.stats = dict(received=0, dropped=0, duplicated=0, reordered=0, forwarded=0)
+
+        self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listen_socket.bind(('127.0.0.1', listen_port))
+        self.send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.queue = []
+        self.sequence = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.listen_socket.close()
+        self.send_socket.close()
+
+    def schedule(self, data, now):
+        delay = self.delay + abs(self.rng.gauss(0, self.jitter)) if self.jitter else self.delay
+        if self.rng.random() < self.reorder:
+            # Hold this packet back long enough for the next ones to overtake it
+            delay += 0.03 + self.rng.random() * 0.03
+            self.stats['reordered'] += 1
+        self.sequence += 1
+        heapq.heappush(self.queue, (now + delay, self.sequence, data))
+
+    def run(self):
+        while self.running:
+            now = time.time()
+            while self.queue and self.queue[0][0] <= now:
+                self.send_socket.sendto(heapq.heappop(self.queue)[2], self.destination)
+                self.stats['forwarded'] += 1
+            timeout = min(0.1, self.queue[0][0] - now) if self.queue else 0.1
+            readable = select.select([self.listen_socket], [], [], max(timeout, 0))[0]
+            if readable:
+                data = self.listen_socket.recv(65536)
+                now = time.time()
+                self.stats['received'] += 1
+                if self.loss_model.lose():
+                    self.stats['dropped'] += 1
+                    continue
+                self.schedule(data, now)
+                if self.rng.random() < self.duplicate:
+                    self.stats['duplicated'] += 1
+                    self.schedule(data, now)
+
+
+# name: loss model arguments, proxy arguments
+SCENARIOS = [
+    ('clean', {}, {}),
+    ('random-1%', dict(loss_good=0.01), {}),
+    ('random-5%', dict(loss_good=0.05), {}),
+    ('burst', dict(p=0.01, r=0.3), {}),
+    ('jitter-20ms', {}, dict(delay=5, jitter=20)),
+    ('reorder-5%', {}, dict(reorder=0.05)),
+    ('duplicate-2%', {}, dict(duplicate=0.02)),
+    ('wan', dict(p=0.005, r=0.4, loss_good=0.005), dict(delay=20, jitter=10, reorder=0.01, duplicate=0.005)),
+]
+
+SAMPLE_FORMATS = {'S16LE': ('h', 32768.0), 'S32LE': ('i', 2147483648.0), 'F32LE': ('f', 1.0), 'F64LE': ('d', 1.0)}
+
+
+class AudioAnalyser(object):
+
+    """
+        Collects the received audio and compares it, in short blocks, with
+        the transmitted test tone (a sine at tone_frequency).
+    """
+
+    def __init__(self, tone_frequency=440.0, block_duration=0.02):
+        self.tone_frequency = tone_frequency
+        self.block_duration = block_duration
+        self.samples = array.array('d')
+        self.rate = None
+        self.discontinuities = 0
+        self.gaps = 0
+
+    def sink_probe(self, pad, info):
+        from openob.gstreamer import Gst
+        buffer = info.get_buffer()
+        structure = pad.get_current_caps().get_structure(0)
+        self.rate = structure.get_value('rate')
+        channels = structure.get_value('channels')
+        typecode, scale = SAMPLE_FORMATS[structure.get_value('format')]
+        if buffer.has_flags(Gst.BufferFlags.DISCONT):
+            self.discontinuities += 1
+        if buffer.has_flags(Gst.BufferFlags.GAP):
+            self.gaps += 1
+        data = array.array(typecode)
+        data.frombytes(buffer.extract_dup(0, buffer.get_size()))
+        self.samples.extend(value / scale for value in data[::channels])
+        return Gst.PadProbeReturn.OK
+
+    def analyse(self, skip=1.0):
+        """Return (mean SNR in dB, % of blocks impaired, % of blocks silent)"""
+        if not self.rate:
+            return None, 100.0, 100.0
+        block = int(self.rate * self.block_duration)
+        omega = 2 * math.pi * self.tone_frequency / self.rate
+        basis = [(math.sin(omega * n), math.cos(omega * n)) for n in range(block)]
+        snrs = []
+        impaired = silent = 0
+        for start in range(int(self.rate * skip), len(self.samples) - block, block):
+            values = self.samples[start:start + block]
+            energy = sum(v * v for v in values)
+            if energy / block < 1e-6:
+                silent += 1
+                impaired += 1
+                snrs.append(0.0)
+                continue
+            # Least-squares fit of the tone; whatever is left over is noise
+            a = 2.0 / block * sum(v * s for v, (s, c) in zip(values, basis))
+            b = 2.0 / block * sum(v * c for v, (s, c) in zip(values, basis))
+            noise = sum((v - a * s - b * c) ** 2 for v, (s, c) in zip(values, basis))
+            snr = 10 * math.log10(energy / noise) if noise > 0 else 100.0
+            snrs.append(min(snr, 100.0))
+            if snr < 20:
+                impaired += 1
+        if not snrs:
+            return None, 100.0, 100.0
+        return sum(snrs) / len(snrs), 100.0 * impaired / len(snrs), 100.0 * silent / len(snrs)
+
+
+def configure_link(config, port, encoding='opus', bitrate=128, jitter_buffer=40, framesize=20, fec=True, loss=0):
+    """Set every link key a transmitter or receiver needs, as bin/openob would"""
+    config.set('name', config.link_name)
+    config.set('port', port)
+    config.set('receiver_host', '127.0.0.1')
+    config.set('jitter_buffer', jitter_buffer)
+    config.set('encoding', encoding)
+    config.set('bitrate', bitrate)
+    config.set('multicast', False)
+    config.set('input_samplerate', 0)
+    config.set('opus_framesize', framesize)
+    config.set('opus_complexity', 9)
+    config.set('opus_fec', fec)
+    config.set('opus_loss_expectation', loss)
+    config.set('opus_dtx', False)
+    config.set('sync', 'none')
+    config.set('playout_margin', 50)
+    config.set('silence_suppression', False)
+    config.set('retransmission', False)
+    config.set('send_buffer', 0)
+    config.set('receive_buffer', 0)
+    config.set('dscp', -1)
+    config.set('multicast_ttl', 1)
+    config.set('resample_quality', 9)
+    config.set('resample_method', 'kaiser')
+    config.set('thread_queues', False)
+    config.set('queue_latency', 20)
+
+
+def test_interfaces(name):
+    """Return (tx, rx) AudioInterfaces using test audio"""
+    from openob.audio_interface import AudioInterface
+    tx_interface = AudioInterface('%s-tx' % name)
+    tx_interface.set('mode', 'tx')
+    tx_interface.set('type', 'test')
+    tx_interface.set('samplerate', 0)
+    tx_interface.set('bind_address', None)
+    tx_interface.set('multicast_iface', None)
+    rx_interface = AudioInterface('%s-rx' % name)
+    rx_interface.set('mode', 'rx')
+    rx_interface.set('type', 'test')
+    rx_interface.set('drift_correction', False)
+    rx_interface.set('bind_address', None)
+    rx_interface.set('multicast_iface', None)
+    return tx_interface, rx_interface
+
+
+def run_scenario(opts, name, loss_args, proxy_args):
+    from openob.gstreamer import Gst, GLib
+    from openob.link_config import LinkConfig
+    from openob.rtp.tx import RTPTransmitter
+    from openob.rtp.rx import RTPReceiver
+
+    tx_config = LinkConfig('impairment-harness-tx', opts.config_host)
+    rx_config = LinkConfig('impairment-harness-rx', opts.config_host)
+    for config, port in ((tx_config, opts.port), (rx_config, opts.port + 2)):
+        configure_link(config, port, opts.encoding, opts.bitrate, opts.jitter_buffer, opts.framesize, opts.fec, opts.loss)
+    tx_interface, rx_interface = test_interfaces('harness')
+
+    proxy = ImpairmentProxy(opts.port, '127.0.0.1', opts.port + 2, GilbertElliott(**loss_args), seed=opts.seed, **proxy_args)
+    proxy.start()
+
+    transmitter = RTPTransmitter('harness-tx', tx_config, tx_interface)
+    transmitter.run()
+    rx_config.set('caps', transmitter.get_caps())
+    receiver = RTPReceiver('harness-rx', rx_config, rx_interface)
+    analyser = AudioAnalyser()
+    for sink in receiver.output.iterate_sinks():
+        sink.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, analyser.sink_probe)
+    receiver.run()
+
+    main_loop = GLib.MainLoop()
+    GLib.timeout_add_seconds(opts.duration, main_loop.quit)
+    main_loop.run()
+
+    jitterbuffer = receiver.jitterbuffer.get_property('stats') if receiver.jitterbuffer is not None else None
+    receiver.close()
+    transmitter.close()
+    proxy.stop()
+
+    snr, impaired, silent = analyser.analyse()
+    result = dict(proxy.stats, scenario=name, snr=snr, impaired=impaired, silent=silent,
+                  discontinuities=analyser.discontinuities, gaps=analyser.gaps)
+    for field in ('num-pushed', 'num-lost', 'num-late', 'num-duplicates'):
+        result[field] = jitterbuffer.get_value(field) if jitterbuffer is not None else None
+    return result
+
+
+def print_results(results):
+    columns = [
+        ('scenario', 'SCENARIO', '%s'), ('received', 'SENT', '%s'), ('dropped', 'DROPPED', '%s'),
+        ('reordered', 'REORDERED', '%s'), ('duplicated', 'DUPED', '%s'),
+        ('num-lost', 'CONCEALED', '%s'), ('num-late', 'LATE', '%s'), ('gaps', 'GAPS', '%s'),
+        ('snr', 'SNR dB', '%.1f'), ('impaired', 'IMPAIRED %', '%.2f'), ('silent', 'SILENT %', '%.2f'),
+    ]
+    rows = [[title for field, title, fmt in columns]]
+    for result in results:
+        rows.append([fmt % result[field] if result[field] is not None else '-' for field, title, fmt in columns])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+
+def run_proxy(opts):
+    proxy = ImpairmentProxy(
+        opts.listen_port, opts.host, opts.port,
+        GilbertElliott(p=opts.burst_p, r=opts.burst_r, loss_good=opts.loss / 100.0),
+        delay=opts.delay, jitter=opts.jitter, reorder=opts.reorder / 100.0,
+        duplicate=opts.duplicate / 100.0, seed=opts.seed)
+    proxy.start()
+    try:
+        while True:
+            time.sleep(5)
+            print(proxy.stats)
+    except KeyboardInterrupt:
+        proxy.stop()
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'proxy':
+        parser = argparse.ArgumentParser(prog='impairment.py proxy', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+        parser.add_argument('listen_port', type=int, help="Local UDP port to receive packets on")
+        parser.add_argument('host', type=str, help="Host to forward packets to")
+        parser.add_argument('port', type=int, help="Port to forward packets to")
+        parser.add_argument('--loss', type=float, default=0, help="Random packet loss (%%)")
+        parser.add_argument('--burst_p', type=float, default=0, help="Gilbert-Elliott good to bad transition probability")
+        parser.add_argument('--burst_r', type=float, default=1, help="Gilbert-Elliott bad to good transition probability")
+        parser.add_argument('--delay', type=float, default=0, help="Fixed delay (ms)")
+        parser.add_argument('--jitter', type=float, default=0, help="Delay jitter, standard deviation (ms)")
+        parser.add_argument('--reorder', type=float, default=0, help="Packets held back to be reordered (%%)")
+        parser.add_argument('--duplicate', type=float, default=0, help="Packets duplicated (%%)")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed")
+        run_proxy(parser.parse_args(sys.argv[2:]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config_host', type=str, default='127.0.0.1', help="Configuration (redis) host")
+    parser.add_argument('-p', '--port', type=int, default=4000, help="Base port; the proxy listens here and the receiver on port + 2")
+    parser.add_argument('-s', '--scenario', action='append', choices=[s[0] for s in SCENARIOS], help="Scenario(s) to run (default: all)")
+    parser.add_argument('-d', '--duration', type=int, default=20, help="Seconds to run each scenario for")
+    parser.add_argument('-e', '--encoding', type=str, choices=['pcm', 'opus'], default='opus')
+    parser.add_argument('-b', '--bitrate', type=int, default=128)
+    parser.add_argument('-j', '--jitter_buffer', type=int, default=40)
+    parser.add_argument('-l', '--loss', type=int, default=0, help="Opus expected packet loss percentage")
+    parser.add_argument('--framesize', type=int, default=20)
+    parser.add_argument('--fec', action='store_true', dest='fec')
+    parser.add_argument('--no-fec', action='store_false', dest='fec')
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for the impairments")
+    parser.set_defaults(fec=True)
+    opts = parser.parse_args()
+
+    LoggerFactory(level=logging.WARNING)
+    results = []
+    for name, loss_args, proxy_args in SCENARIOS:
+        if opts.scenario and name not in opts.scenario:
+            continue
+        print('Running %s for %is...' % (name, opts.duration))
+        results.append(run_scenario(opts, name, loss_args, proxy_args))
+    print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+    Measure OpenOB start-up cost.
+
+    Times (in fresh interpreters) how long it takes to print the CLI help,
+    to import the Node machinery, and to actually initialise GStreamer, which
+    is now only paid once a pipeline is built. Run from the repository root:
+
+        python benchmarks/import_time.py [-n RUNS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('openob --help', [os.path.join(ROOT, 'bin', 'openob'), '--help']),
+    ('import openob.node', ['-c', 'import openob.node']),
+    ('gstreamer.init()', ['-c', 'from openob import gstreamer; gstreamer.init()']),
+]
+
+
+def time_case(args, runs):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', '')])
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        result = subprocess.call([sys.executable] + args, env=env,
+                                 stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+        timings.append(time.time() - start)
+        if result != 0:
+            return None
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--runs', type=int, default=10, help="Runs per case; the median is reported")
+    opts = parser.parse_args()
+
+    baseline = time_case(['-c', 'pass'], opts.runs)
+    print('%-22s %10s %10s' % ('case', 'median ms', 'over bare'))
+    print('%-22s %10.1f %10s' % ('python -c pass', baseline * 1000, '-'))
+    for name, args in CASES:
+        median = time_case(args, opts.runs)
+        if median is None:
+            print('%-22s %10s %10s' % (name, 'failed', '-'))
+        else:
+            print('%-22s %10.1f %10.1f' % (name, median * 1000, (median - baseline) * 1000))
+
+
+if __name__ == '__main__':
+    main()
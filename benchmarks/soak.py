@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+    Restart soak test for OpenOB links.
+
+    Starts and tears down a transmitter and receiver on localhost, using test
+    audio, over and over again through the same Node teardown path used when
+    a link restarts. After a warm-up, the process's resident memory, open
+    file descriptors and thread count are sampled; the test fails if any of
+    them keep growing, as a Node that flaps for weeks would otherwise leak.
+    Every --crash_every cycles the transmitter crashes instead of stopping
+    cleanly, and is torn down by the Node's crash handler.
+
+    Needs GStreamer and a redis server on the configuration host (by default
+    localhost), as for a normal link. Run from the repository root:
+
+        python benchmarks/soak.py [-n 5000] [--cycle_time 200] [--crash_every 2]
+"""
+
+import argparse
+import gc
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openob.logger import LoggerFactory
+from impairment import configure_link, test_interfaces
+
+# The crash handler logs a traceback for every injected crash
+crash_logger = logging.getLogger('soak.crash')
+crash_logger.setLevel(logging.CRITICAL)
+
+
+class InjectedCrash(Exception):
+    pass
+
+
+def process_usage():
+    """Return (RSS in kB, open fds, threads) for this process"""
+    gc.collect()
+    usage = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, value = line.split(':', 1)
+            usage[key] = value.split()[0]
+    return int(usage['VmRSS']), len(os.listdir('/proc/self/fd')), int(usage['Threads'])
+
+
+def run_cycle(opts, tx_node, rx_node, tx_config, rx_config, tx_interface, rx_interface, crash=False):
+    """
+        Run one link for cycle_time ms, then tear it down; return True if
+        audio got through. If crash is set, the transmitter raises rather
+        than stopping cleanly.
+    """
+    from openob.gstreamer import GLib
+    from openob.rtp.tx import RTPTransmitter
+    from openob.rtp.rx import RTPReceiver
+
+    transmitter = RTPTransmitter(tx_node.node_name, tx_config, tx_interface)
+    tx_node.start_link(transmitter)
+    transmitter.run()
+    rx_config.set('caps', transmitter.get_caps())
+    receiver = RTPReceiver(rx_node.node_name, rx_config, rx_interface)
+    rx_node.start_link(receiver)
+    receiver.run()
+
+    main_loop = GLib.MainLoop()
+    GLib.timeout_add(opts.cycle_time, main_loop.quit)
+    main_loop.run()
+
+    received = receiver.started
+    rx_node.stop_link()
+    if crash:
+        # As if the transmitter had raised while running; the Node's crash
+        # handler must release everything it held
+        try:
+            raise InjectedCrash('Crash injected by the soak test')
+        except InjectedCrash:
+            tx_node.link_crashed(crash_logger, 'Transmitter')
+    else:
+        tx_node.stop_link()
+    return received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config_host', type=str, default='127.0.0.1', help="Configuration (redis) host")
+    parser.add_argument('-p', '--port', type=int, default=4100, help="Port to run the link on")
+    parser.add_argument('-n', '--cycles', type=int, default=5000, help="Number of restart cycles")
+    parser.add_argument('--cycle_time', type=int, default=200, help="How long (ms) each link runs before being torn down")
+    parser.add_argument('-e', '--encoding', type=str, choices=['pcm', 'opus'], default='opus')
+    parser.add_argument('--crash_every', type=int, default=2, help="Crash the transmitter every this many cycles, rather than stopping it (0 never crashes)")
+    parser.add_argument('--warmup', type=int, default=50, help="Cycles to run before taking the baseline")
+    parser.add_argument('--sample_every', type=int, default=250, help="Report usage every this many cycles")
+    parser.add_argument('--max_rss_growth', type=int, default=8192, help="Allowed RSS growth (kB) over the baseline")
+    parser.add_argument('--max_thread_growth', type=int, default=2, help="Allowed thread count growth over the baseline")
+    opts = parser.parse_args()
+
+    LoggerFactory(level=logging.WARNING)
+    from openob.link_config import LinkConfig
+    from openob.node import Node
+
+    config = LinkConfig('soak-test', opts.config_host)
+    configure_link(config, opts.port, opts.encoding)
+    tx_interface, rx_interface = test_interfaces('soak')
+    tx_node = Node('soak-tx')
+    rx_node = Node('soak-rx')
+
+    baseline = None
+    silent_cycles = 0
+    print('%8s %10s %6s %8s %8s' % ('cycle', 'RSS kB', 'fds', 'threads', 'silent'))
+    for cycle in range(1, opts.cycles + 1):
+        crash = opts.crash_every > 0 and cycle % opts.crash_every == 0
+        if not run_cycle(opts, tx_node, rx_node, config, config, tx_interface, rx_interface, crash):
+            silent_cycles += 1
+        if cycle == opts.warmup:
+            baseline = process_usage()
+        if cycle % opts.sample_every == 0 or cycle == opts.warmup:
+            rss, fds, threads = process_usage()
+            print('%8i %10i %6i %8i %8i' % (cycle, rss, fds, threads, silent_cycles))
+
+    rss, fds, threads = process_usage()
+    failures = []
+    if baseline is None:
+        failures.append('fewer cycles than the warm-up; nothing to compare')
+    else:
+        if rss - baseline[0] > opts.max_rss_growth:
+            failures.append('RSS grew by %ikB' % (rss - baseline[0]))
+        if fds > baseline[1]:
+            failures.append('open fds grew from %i to %i' % (baseline[1], fds))
+        if threads - baseline[2] > opts.max_thread_growth:
+            failures.append('threads grew from %i to %i' % (baseline[2], threads))
+    if silent_cycles:
+        print('%i of %i cycles received no audio' % (silent_cycles, opts.cycles))
+    if failures:
+        print('FAIL: %s' % '; '.join(failures))
+        sys.exit(1)
+    print('PASS: %i cycles, RSS %+ikB, fds %+i, threads %+i' % (
+        opts.cycles, rss - baseline[0], fds - baseline[1], threads - baseline[2]))
+
+
+if __name__ == '__main__':
+    main()
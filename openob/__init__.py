@@ -1 +1 @@
-__all__ = ["logger","link_config","rtp.rx","rtp.tx","node"]
+__all__ = ["logger","link_config","gstreamer","status","profiler","rtp.rx","rtp.tx","node"]
@@ -41,6 +41,10 @@ class AudioInterface(object):
             self.set("samplerate", opts.samplerate)
         elif opts.mode == "rx":
             self.set("type", opts.audio_output)
+            self.set("drift_correction", opts.drift_correction)
+        # Local addressing differs on each Node, so isn't part of the link config
+        self.set("bind_address", opts.bind_address)
+        self.set("multicast_iface", opts.multicast_iface)
         if self.get("type") == "alsa":
             self.set("alsa_device", opts.alsa_device)
         elif self.get("type") == "jack":
@@ -0,0 +1,77 @@
+class MissingElementError(Exception):
+
+    """
+        Raised when one or more GStreamer element factories needed to build a
+        pipeline are not installed. Retrying will not help; the missing
+        plugins need installing on this Node.
+    """
+
+    def __init__(self, factories):
+        self.factories = sorted(factories)
+        Exception.__init__(
+            self,
+            "Missing GStreamer element(s): %s - check the relevant GStreamer "
+            "plugin packages are installed" % ', '.join(self.factories)
+        )
+
+
+_repository = {}
+_factory_cache = {}
+
+
+def init():
+    """
+        Import and initialise GStreamer, once. Importing gi and loading the
+        plugin registry is slow, so this is deferred until a pipeline is
+        actually built rather than happening when openob is imported.
+    """
+    if not _repository:
+        import gi
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst, GLib
+        Gst.init(None)
+        _repository['Gst'] = Gst
+        _repository['GLib'] = GLib
+    return _repository['Gst'], _repository['GLib']
+
+
+def _load(name):
+    """Return a gi.repository module, importing it (and GStreamer) if needed"""
+    init()
+    if name not in _repository:
+        import gi
+        gi.require_version(name, '1.0')
+        _repository[name] = getattr(__import__('gi.repository', fromlist=[name]), name)
+    return _repository[name]
+
+
+class _LazyRepository(object):
+
+    """Stand-in for a gi.repository module which initialises it on first use"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(_load(self._name), attr)
+
+
+Gst = _LazyRepository('Gst')
+GLib = _LazyRepository('GLib')
+GstNet = _LazyRepository('GstNet')
+
+
+def require_elements(factories):
+    """
+        Check that every named element factory is available, raising
+        MissingElementError listing all that are not. Lookups are cached, so
+        calling this on every pipeline (re)build only hits the registry once.
+    """
+    missing = []
+    for factory in factories:
+        if factory not in _factory_cache:
+            _factory_cache[factory] = Gst.ElementFactory.find(factory) is not None
+        if not _factory_cache[factory]:
+            missing.append(factory)
+    if missing:
+        raise MissingElementError(missing)
@@ -1,6 +1,6 @@
-import redis
 import time
 from openob.logger import LoggerFactory
+from openob.status import STATUS_TIMEOUT
 
 
 class LinkConfig(object):
@@ -17,17 +17,35 @@ class LinkConfig(object):
             Set up a new LinkConfig instance - needs to know the link name and
             configuration host.
         """
-        self.int_properties = ['port', 'jitter_buffer', 'opus_framesize', 'opus_complexity', 'bitrate', 'opus_loss_expectation']
-        self.bool_properties = ['opus_dtx', 'opus_fec', 'multicast']
+        self.int_properties = ['port', 'jitter_buffer', 'opus_framesize', 'opus_complexity', 'bitrate', 'opus_loss_expectation', 'ptp_domain', 'silence_threshold', 'rtx_history', 'rtx_max_retries', 'send_buffer', 'receive_buffer', 'dscp', 'multicast_ttl', 'resample_quality', 'queue_latency', 'playout_margin']
+        self.bool_properties = ['opus_dtx', 'opus_fec', 'multicast', 'silence_suppression', 'retransmission', 'thread_queues']
+        # Settings which transmitters from older versions don't publish; a
+        # newer receiver falls back to these rather than failing
+        self.defaults = {
+            'sync': 'none', 'ptp_domain': 0, 'playout_margin': 50,
+            'silence_suppression': False, 'silence_threshold': -60,
+            'retransmission': False, 'rtx_history': 500, 'rtx_max_retries': 2,
+            'send_buffer': 0, 'receive_buffer': 0, 'dscp': -1, 'multicast_ttl': 1,
+            'resample_quality': 9, 'resample_method': 'kaiser',
+            'thread_queues': False, 'queue_latency': 20,
+        }
         self.link_name = link_name
         self.redis_host = redis_host
         self.logger_factory = LoggerFactory()
         self.logger = self.logger_factory.getLogger('link.%s.config' % self.link_name)
         self.logger.info("Connecting to configuration host %s" % self.redis_host)
         self.redis = None
+        self.status_redis = None
+        # Deferred so that the CLI can parse arguments without loading redis
+        import redis
         while True:
             try:
                 self.redis = redis.StrictRedis(host=self.redis_host, charset="utf-8", decode_responses=True)
+                # Status records are published from another thread, on a
+                # connection which gives up quickly if the host hangs
+                self.status_redis = redis.StrictRedis(
+                    host=self.redis_host, charset="utf-8", decode_responses=True,
+                    socket_timeout=STATUS_TIMEOUT, socket_connect_timeout=STATUS_TIMEOUT)
                 break
             except Exception as e:
                 self.logger.error(
@@ -36,13 +54,20 @@ class LinkConfig(object):
                 )
                 time.sleep(0.1)
 
-    def blocking_get(self, key):
-        """Get a value, blocking until it's not None if needed"""
+    def blocking_get(self, key, waiting=None, interval=5):
+        """
+            Get a value, blocking until it's not None if needed. If given,
+            waiting is called every interval seconds while blocked.
+        """
+        last_called = time.time()
         while True:
             value = self.get(key)
             if value is not None:
                 self.logger.debug("Fetched (blocking) %s, got %s" % (key, value))
                 return value
+            if waiting is not None and time.time() - last_called >= interval:
+                waiting()
+                last_called = time.time()
             time.sleep(0.1)
 
     def set(self, key, value):
@@ -62,10 +87,13 @@ class LinkConfig(object):
         value = self.redis.get(scoped_key)
         
         # Do some typecasting
-        if key in self.int_properties:
+        if value is None and key in self.defaults:
+            value = self.defaults[key]
+        elif key in self.int_properties:
             value = int(value)
-        if key in self.bool_properties:
-            value = (value == 'True')
+        elif key in self.bool_properties:
+            # set() stores booleans as integers
+            value = (value in ('1', 'True'))
         self.logger.debug("Fetched %s, got %s" % (scoped_key, value))
         return value
 
@@ -74,6 +102,24 @@ class LinkConfig(object):
         self.redis.delete(scoped_key)
         self.logger.debug("Unset %s" % scoped_key)
 
+    def publish_status(self, node_name, status, ttl):
+        """
+            Publish a Node's status record for this link as a hash which
+            expires after ttl seconds. The writes are pipelined into a single
+            transaction so readers never see a partial record. This uses its
+            own connection, with short timeouts, and is safe to call from
+            another thread.
+        """
+        scoped_key = self.scoped_key('status:%s' % node_name)
+        pipe = self.status_redis.pipeline()
+        pipe.delete(scoped_key)
+        for field, value in status.items():
+            if value is not None:
+                pipe.hset(scoped_key, field, value)
+        pipe.expire(scoped_key, ttl)
+        pipe.execute()
+        self.logger.debug("Published status to %s" % scoped_key)
+
     def __getattr__(self, key):
         """Convenience method to access get"""
         return self.get(key)
@@ -98,6 +144,23 @@ class LinkConfig(object):
             self.set("opus_fec", opts.fec)
             self.set("opus_loss_expectation", opts.loss)
             self.set("opus_dtx", opts.dtx)
+            self.set("sync", opts.sync)
+            self.set("sync_server", opts.sync_server)
+            self.set("ptp_domain", opts.ptp_domain)
+            self.set("playout_margin", opts.playout_margin)
+            self.set("silence_suppression", opts.silence_suppression)
+            self.set("silence_threshold", opts.silence_threshold)
+            self.set("retransmission", opts.retransmission)
+            self.set("rtx_history", opts.rtx_history)
+            self.set("rtx_max_retries", opts.rtx_max_retries)
+            self.set("send_buffer", opts.send_buffer)
+            self.set("receive_buffer", opts.receive_buffer)
+            self.set("dscp", opts.dscp)
+            self.set("multicast_ttl", opts.multicast_ttl)
+            self.set("resample_quality", opts.resample_quality)
+            self.set("resample_method", opts.resample_method)
+            self.set("thread_queues", opts.thread_queues)
+            self.set("queue_latency", opts.queue_latency)
 
     def commit_changes(self, restart=False):
         """
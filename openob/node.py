@@ -4,6 +4,8 @@ from openob.logger import LoggerFactory
 from openob.rtp.tx import RTPTransmitter
 from openob.rtp.rx import RTPReceiver
 from openob.link_config import LinkConfig
+from openob.gstreamer import GLib, MissingElementError
+from openob.status import STATUS_INTERVAL, StatusPublisher, caps_hash
 
 class Node(object):
 
@@ -23,11 +25,67 @@ class Node(object):
         data and communicate with other Nodes.
     """
 
-    def __init__(self, node_name):
-        """Set up a new node."""
+    def __init__(self, node_name, profiler=None):
+        """Set up a new node, optionally profiling its pipelines with a Profiler."""
         self.node_name = node_name
+        self.profiler = profiler
         self.logger_factory = LoggerFactory()
         self.logger = self.logger_factory.getLogger('node.%s' % self.node_name)
+        self.link = None
+        self.link_started = None
+        self.restarts = 0
+        self.caps = None
+        self.status_publisher = StatusPublisher(node_name)
+
+    def start_link(self, link):
+        """Record that a new transmitter or receiver is running this link"""
+        if self.link_started is not None:
+            self.restarts += 1
+        self.link = link
+        self.link_started = time.time()
+        if self.profiler is not None:
+            self.profiler.attach(link.pipeline, '%s-%s' % (link.link_config.name, link.audio_interface.mode))
+
+    def stop_link(self):
+        """Tear down the running transmitter or receiver, if any"""
+        if self.link is not None:
+            if self.profiler is not None:
+                self.profiler.detach()
+            try:
+                self.link.close()
+            except Exception as e:
+                self.logger.exception("Unable to cleanly close link: %s" % e)
+        self.link = None
+
+    def link_crashed(self, link_logger, role):
+        """Log why the running transmitter or receiver crashed, and tear it down"""
+        link_logger.exception("%s crashed for some reason! Restarting..." % role)
+        self.stop_link()
+
+    def publish_status(self, link_config, audio_interface):
+        """
+            Publish a status record for our end of the link to the config
+            host. Called periodically from the GLib main loop, so this only
+            takes a snapshot of the link's stats; the StatusPublisher writes
+            it out from its own thread.
+        """
+        status = {
+            'mode': audio_interface.mode,
+            'state': 'waiting',
+            'caps_hash': caps_hash(self.caps),
+            'restarts': self.restarts,
+            'uptime': 0,
+            'updated': int(time.time()),
+        }
+        try:
+            if self.link is not None:
+                status.update(self.link.get_stats())
+                status['levels'] = ','.join('%.1f' % level for level in status['levels'])
+                status['uptime'] = int(time.time() - self.link_started)
+        except Exception as e:
+            self.logger.warning("Unable to collect link status: %s" % e)
+        self.status_publisher.publish(link_config, status)
+        return True
 
     def run_link(self, link_config, audio_interface):
         """
@@ -37,35 +95,52 @@ class Node(object):
         # maintain a link under all circumstances forever.
         self.logger.info("Link %s initial setup start on %s" % (link_config.name, self.node_name))
         link_logger = self.logger_factory.getLogger('node.%s.link.%s' % (self.node_name, link_config.name))
+        GLib.timeout_add_seconds(STATUS_INTERVAL, self.publish_status, link_config, audio_interface)
         while True:
             try:
                 if audio_interface.mode == 'tx':
                     try:
                         link_logger.info("Starting up transmitter")
                         transmitter = RTPTransmitter(self.node_name, link_config, audio_interface)
-                        transmitter.run()
-                        caps = transmitter.get_caps()
+                        self.start_link(transmitter)
+                        # The status timer only runs in the main loop, so keep
+                        # publishing while we wait for the input's caps
+                        transmitter.run(lambda: self.publish_status(link_config, audio_interface), STATUS_INTERVAL)
+                        self.caps = transmitter.get_caps()
                         link_logger.debug("Got caps from transmitter, setting config")
-                        link_config.set("caps", caps)
+                        link_config.set("caps", self.caps)
                         transmitter.loop()
+                        self.stop_link()
+                    except MissingElementError:
+                        raise
                     except Exception as e:
-                        link_logger.exception("Transmitter crashed for some reason! Restarting...")
+                        self.link_crashed(link_logger, "Transmitter")
                         time.sleep(0.5)
                 elif audio_interface.mode == 'rx':
                     link_logger.info("Waiting for transmitter capabilities...")
-                    caps = link_config.blocking_get("caps")
+                    self.stop_link()
+                    self.publish_status(link_config, audio_interface)
+                    self.caps = link_config.blocking_get(
+                        "caps", lambda: self.publish_status(link_config, audio_interface), STATUS_INTERVAL)
                     link_logger.info("Got caps from transmitter")
                     try:
                         link_logger.info("Starting up receiver")
                         receiver = RTPReceiver(self.node_name, link_config, audio_interface)
+                        self.start_link(receiver)
                         receiver.run()
                         receiver.loop()
+                        self.stop_link()
+                    except MissingElementError:
+                        raise
                     except Exception as e:
-                        link_logger.exception("Receiver crashed for some reason! Restarting...")
+                        self.link_crashed(link_logger, "Receiver")
                         time.sleep(0.1)
                 else:
                     link_logger.critical("Unknown audio interface mode (%s)!" % audio_interface.mode)
                     sys.exit(1)
+            except MissingElementError as e:
+                link_logger.critical("Cannot build the %s pipeline: %s" % (audio_interface.mode, e))
+                sys.exit(1)
             except Exception as e:
                 link_logger.exception("Unknown exception thrown - please report this as a bug! %s" % e)
                 raise
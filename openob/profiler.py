@@ -0,0 +1,188 @@
+import os
+import signal
+import threading
+import time
+from openob.logger import LoggerFactory
+from openob.gstreamer import Gst, GLib
+
+# The latency tracer's element flag gives the time each element takes to pass
+# a buffer on, ie its processing time; rusage gives per-thread CPU load
+TRACERS = 'latency(flags=pipeline+element);rusage'
+
+
+def enable_tracers(trace_file=None):
+    """
+        Turn on the GStreamer tracers used for profiling. This only has an
+        effect before GStreamer is initialised, ie before any pipeline has
+        been built. If trace_file is given, the raw trace (and any other
+        GStreamer debug output) is logged there, eg for gst-stats.
+    """
+    os.environ['GST_TRACERS'] = TRACERS
+    debug = os.environ.get('GST_DEBUG')
+    os.environ['GST_DEBUG'] = 'GST_TRACER:7,%s' % debug if debug else 'GST_TRACER:7'
+    if trace_file is not None:
+        os.environ['GST_DEBUG_FILE'] = trace_file
+
+
+class _Timings(object):
+
+    """Running count, total and maximum of a set of durations (in ns)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def mean(self):
+        return self.total / float(self.count) if self.count else 0.0
+
+
+class Profiler(object):
+
+    """
+        Collects GStreamer tracer output for a Node's pipelines: processing
+        time per element, end-to-end pipeline latency and CPU load per
+        thread. A report, plus a graph of the pipeline, is written to
+        report_dir when the link stops, on SIGUSR1, and once duration
+        seconds have passed if a duration is given, after which profiling
+        stops. Unless raw_trace is set (see enable_tracers), tracer output
+        is kept off the console by standing in for GStreamer's default log
+        function, passing everything else on to it.
+    """
+
+    def __init__(self, node_name, report_dir='.', duration=None, raw_trace=False):
+        self.node_name = node_name
+        self.report_dir = report_dir
+        self.duration = duration
+        self.raw_trace = raw_trace
+        self.logger_factory = LoggerFactory()
+        self.logger = self.logger_factory.getLogger('node.%s.profiler' % self.node_name)
+        self.lock = threading.Lock()
+        self.pipeline = None
+        self.name = None
+        self.collecting = False
+        self.finished = False
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.element_latency = {}
+            self.pipeline_latency = {}
+            self.cpu_load = {}
+            self.process_load = None
+
+    def attach(self, pipeline, name):
+        """Start profiling a newly built pipeline; name is used for the report files"""
+        if self.finished:
+            return
+        self.pipeline = pipeline
+        self.name = name
+        self.reset()
+        if not self.collecting:
+            Gst.debug_add_log_function(self.on_log, None)
+            if not self.raw_trace:
+                Gst.debug_remove_log_function(None)
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGUSR1, self.on_signal)
+            self.collecting = True
+            if self.duration:
+                GLib.timeout_add_seconds(self.duration, self.finish)
+        self.logger.info('Profiling %s' % name)
+
+    def detach(self):
+        """Report on the pipeline being profiled, which has stopped"""
+        if self.collecting and self.pipeline is not None:
+            self.write_report()
+        self.pipeline = None
+
+    def on_signal(self):
+        if self.collecting:
+            self.write_report()
+        return True
+
+    def finish(self):
+        """Write a report and stop collecting"""
+        if self.collecting:
+            self.write_report()
+            # Stop the tracers logging (and the raw trace growing) for the
+            # rest of the process; on_log stays to forward other messages
+            Gst.debug_set_threshold_for_name('GST_TRACER', Gst.DebugLevel.NONE)
+            if self.raw_trace:
+                Gst.debug_remove_log_function(self.on_log)
+            self.collecting = False
+        self.finished = True
+        return False
+
+    def on_log(self, category, level, file, function, line, obj, message, user_data):
+        if category.get_name() != 'GST_TRACER':
+            if not self.raw_trace:
+                Gst.debug_log_default(category, level, file, function, line, obj, message, None)
+            return
+        if not self.collecting:
+            return
+        structure = Gst.Structure.new_from_string(message.get())
+        if structure is None:
+            return
+        name = structure.get_name()
+        with self.lock:
+            if name == 'element-latency':
+                self.element_latency.setdefault(structure.get_value('element'), _Timings()).add(structure.get_value('time'))
+            elif name == 'latency':
+                path = '%s -> %s' % (structure.get_value('src-element'), structure.get_value('sink-element'))
+                self.pipeline_latency.setdefault(path, _Timings()).add(structure.get_value('time'))
+            elif name == 'thread-rusage':
+                self.cpu_load.setdefault(structure.get_value('thread-id'), _Timings()).add(
+                    structure.get_value('current-cpuload'))
+            elif name == 'proc-rusage':
+                self.process_load = structure.get_value('average-cpuload')
+
+    def format_report(self):
+        elapsed = time.time() - self.started
+        lines = ['OpenOB profile of %s on node %s over %.1fs' % (self.name, self.node_name, elapsed), '']
+        with self.lock:
+            lines += self._format_timings(
+                'Processing time per element', self.element_latency, elapsed,
+                'ELEMENT', include_share=True)
+            lines += self._format_timings('Pipeline latency', self.pipeline_latency, elapsed, 'PATH')
+            if self.cpu_load:
+                # rusage reports load in tenths of a percent of the whole machine
+                lines += ['CPU load per thread', '']
+                for thread, load in sorted(self.cpu_load.items(), key=lambda item: -item[1].mean()):
+                    lines.append('thread %-10s mean %5.1f%%  max %5.1f%%' % (
+                        thread, load.mean() / 10.0, load.max / 10.0))
+                lines.append('')
+            if self.process_load is not None:
+                lines += ['Process CPU load %.1f%%' % (self.process_load / 10.0), '']
+        return '\n'.join(lines)
+
+    def _format_timings(self, title, timings, elapsed, column, include_share=False):
+        if not timings:
+            return []
+        width = max(len(column), max(len(str(key)) for key in timings))
+        header = '%-*s %9s %10s %10s %10s' % (width, column, 'COUNT', 'MEAN us', 'MAX us', 'TOTAL ms')
+        if include_share:
+            header += ' %7s' % 'CPU %'
+        lines = [title, '', header]
+        for key, timing in sorted(timings.items(), key=lambda item: -item[1].total):
+            line = '%-*s %9i %10.1f %10.1f %10.1f' % (
+                width, key, timing.count, timing.mean() / 1000.0, timing.max / 1000.0, timing.total / 1e6)
+            if include_share:
+                line += ' %7.2f' % (100.0 * timing.total / (elapsed * 1e9))
+            lines.append(line)
+        return lines + ['']
+
+    def write_report(self):
+        """Write the profile report and a pipeline graph to report_dir"""
+        if self.pipeline is None:
+            return
+        basename = os.path.join(self.report_dir, 'openob-%s-%s' % (self.name, time.strftime('%Y%m%d-%H%M%S')))
+        with open(basename + '.txt', 'w') as f:
+            f.write(self.format_report())
+        with open(basename + '.dot', 'w') as f:
+            f.write(Gst.debug_bin_to_dot_data(self.pipeline, Gst.DebugGraphDetails.ALL))
+        self.logger.info('Wrote profile report to %s.txt' % basename)
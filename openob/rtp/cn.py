@@ -0,0 +1,31 @@
+import struct
+
+# Comfort noise (RFC 3389) is sent with a dynamic payload type, as the static
+# type 13 is only defined for 8kHz audio
+CN_PAYLOAD_TYPE = 118
+# How often (ms) comfort noise updates are sent during silence; this must be
+# well inside the receiver's 3 second no-data timeout
+CN_INTERVAL = 500
+CN_CAPS = 'application/x-rtp,media=(string)audio,encoding-name=(string)CN,clock-rate=(int)%i,payload=(int)%i'
+
+
+def build_cn_packet(ssrc, seqnum, timestamp, level):
+    """
+        Build an RTP comfort noise packet. level is the noise level in -dBov
+        (0 is full scale, 127 is digital silence); no spectral information
+        is sent, so receivers should generate white (or similar) noise.
+    """
+    return struct.pack('!BBHIIB', 0x80, CN_PAYLOAD_TYPE, seqnum & 0xffff,
+                       timestamp & 0xffffffff, ssrc & 0xffffffff, level & 0x7f)
+
+
+def parse_cn_level(data):
+    """Return the noise level of an RTP comfort noise packet, or None if it isn't one"""
+    if len(data) < 13 or struct.unpack_from('!B', data, 1)[0] & 0x7f != CN_PAYLOAD_TYPE:
+        return None
+    return struct.unpack_from('!B', data, 12)[0] & 0x7f
+
+
+def level_to_volume(level):
+    """Convert a comfort noise level in -dBov to a linear volume"""
+    return 10 ** (-level / 20.0)
@@ -0,0 +1,69 @@
+from openob.gstreamer import Gst
+
+# Caps fields audioconvert can change; audioresample changes the rate
+FORMAT_FIELDS = ['format', 'layout', 'channels', 'channel-mask']
+RATE_FIELDS = ['rate']
+
+
+def probe_caps(element, pad_name):
+    """
+        Return the caps an element's pad can actually handle. The element is
+        opened (set to READY) while they are queried, so that for a sound
+        card these reflect the hardware rather than everything the plugin
+        could ever support, then closed again so that the device isn't held
+        open if the pipeline fails to build. Returns None if the element
+        can't be opened.
+    """
+    if element.set_state(Gst.State.READY) == Gst.StateChangeReturn.FAILURE:
+        element.set_state(Gst.State.NULL)
+        return None
+    caps = element.get_static_pad(pad_name).query_caps(None)
+    element.set_state(Gst.State.NULL)
+    return caps
+
+
+def _without(caps, fields):
+    stripped = Gst.Caps.new_empty()
+    for i in range(caps.get_size()):
+        structure = caps.get_structure(i).copy()
+        for field in fields:
+            structure.remove_field(field)
+        stripped.append_structure(structure)
+    return stripped
+
+
+def conversions_needed(src_caps, sink_caps):
+    """
+        Work out what has to sit between a pad producing src_caps and one
+        accepting sink_caps, returning (resample, convert). Where src_caps
+        aren't known (None or ANY) both are assumed to be needed.
+    """
+    if src_caps is None or src_caps.is_any() or src_caps.is_empty():
+        return True, True
+    if src_caps.can_intersect(sink_caps):
+        return False, False
+    rates_match = _without(src_caps, FORMAT_FIELDS).can_intersect(_without(sink_caps, FORMAT_FIELDS))
+    formats_match = _without(src_caps, RATE_FIELDS).can_intersect(_without(sink_caps, RATE_FIELDS))
+    if rates_match and formats_match:
+        # Each matches on its own, but not in combination
+        return True, True
+    return not rates_match, not formats_match
+
+
+def build_resampler(link_config, name=None):
+    """Return an audioresample element using the link's quality and method"""
+    resample = Gst.ElementFactory.make('audioresample', name)
+    resample.set_property('quality', link_config.resample_quality)
+    Gst.util_set_object_arg(resample, 'resample-method', link_config.resample_method)
+    return resample
+
+
+def describe_conversion(resample, convert):
+    """Describe, for logging, the conversions conversions_needed() chose"""
+    if resample and convert:
+        return 'resampled and converted'
+    if resample:
+        return 'resampled'
+    if convert:
+        return 'converted'
+    return 'passed through without conversion'
@@ -0,0 +1,97 @@
+from collections import deque
+
+
+class DriftEstimator(object):
+
+    """
+        Estimates the clock drift between a sender and this receiver.
+
+        Samples pair the RTP timestamp of an arriving packet with its local
+        arrival time. A least-squares fit over a sliding window gives the rate
+        of the sender's media clock as seen by our clock; network jitter
+        averages out over the window.
+
+        The estimate is turned into a resampler input rate. Rates are
+        integers, so the fractional part is carried from one update to the
+        next (first order sigma-delta) so that, on average, exactly as many
+        samples are played as arrive and the buffer fill stays constant.
+    """
+
+    def __init__(self, clock_rate, window=600, min_span=30.0, sample_interval=0.5):
+        self.clock_rate = clock_rate
+        self.min_span = min_span
+        self.sample_interval = sample_interval
+        self.samples = deque(maxlen=window)
+        self.last_rtp_timestamp = None
+        self.rtp_wraps = 0
+        self.last_sample_time = None
+        self.residual = 0.0
+        self.ppm = 0.0
+        self.correction_ppm = 0.0
+
+    def wants_sample(self, arrival_time):
+        """Whether a packet arriving at arrival_time should be sampled"""
+        return self.last_sample_time is None or arrival_time - self.last_sample_time >= self.sample_interval
+
+    def add_sample(self, rtp_timestamp, arrival_time):
+        """Add an (RTP timestamp, local arrival time in seconds) pair"""
+        if self.last_rtp_timestamp is not None and rtp_timestamp < self.last_rtp_timestamp \
+                and self.last_rtp_timestamp - rtp_timestamp > 0x80000000:
+            self.rtp_wraps += 1
+        self.last_rtp_timestamp = rtp_timestamp
+        self.last_sample_time = arrival_time
+        media_time = (rtp_timestamp + self.rtp_wraps * 0x100000000) / float(self.clock_rate)
+        if self.samples:
+            last_arrival_time, last_media_time = self.samples[-1]
+            if abs((media_time - last_media_time) - (arrival_time - last_arrival_time)) > 1.0:
+                # Timestamps jumped, most likely a new sender; start again
+                self.reset()
+                return
+        self.samples.append((arrival_time, media_time))
+
+    def reset(self):
+        """Forget all samples, eg after a sender restart or timestamp jump"""
+        self.samples.clear()
+        self.last_rtp_timestamp = None
+        self.rtp_wraps = 0
+        self.last_sample_time = None
+        self.residual = 0.0
+
+    def estimate(self):
+        """
+            Update and return the drift of the sender clock relative to ours
+            in parts per million; positive means the sender runs fast. Returns
+            None until the samples span at least min_span seconds.
+        """
+        if len(self.samples) < 2 or self.samples[-1][0] - self.samples[0][0] < self.min_span:
+            return None
+        x0, y0 = self.samples[0]
+        n = len(self.samples)
+        sum_x = sum_y = sum_xx = sum_xy = 0.0
+        for x, y in self.samples:
+            x -= x0
+            y -= y0
+            sum_x += x
+            sum_y += y
+            sum_xx += x * x
+            sum_xy += x * y
+        denominator = n * sum_xx - sum_x * sum_x
+        if denominator == 0:
+            return None
+        slope = (n * sum_xy - sum_x * sum_y) / denominator
+        self.ppm = (slope - 1.0) * 1e6
+        return self.ppm
+
+    def resampler_rate(self, nominal_rate):
+        """
+            Return the integer input rate to give the resampler so that audio
+            produced at nominal_rate by the sender's clock plays out at
+            nominal_rate on ours. correction_ppm is set to the correction the
+            rates average out to, rather than that of this (quantised) rate.
+        """
+        ideal = nominal_rate * (1.0 + self.ppm / 1e6)
+        target = ideal + self.residual
+        rate = int(round(target))
+        self.residual = target - rate
+        self.correction_ppm = (ideal / nominal_rate - 1.0) * 1e6
+        return rate
@@ -0,0 +1,60 @@
+from openob.gstreamer import Gst
+
+
+class ThreadQueues(object):
+
+    """
+        Queues at the boundaries between pipeline stages (eg capture, encode
+        and send), so each stage runs in its own streaming thread and can use
+        its own core. The queues are leaky and hold at most latency ms of
+        audio: if a stage falls behind, the oldest audio is dropped rather
+        than the delay growing or the stage before it being held up. Each
+        queue holds at least two frames (frame_duration ms), so that a
+        single packet, or a short burst from the jitter buffer, never
+        overruns it.
+    """
+
+    def __init__(self, latency, frame_duration=0):
+        self.latency = max(latency, 2 * frame_duration)
+        self.queues = []
+        self.overruns = 0
+
+    def link(self, bin, stages, names):
+        """
+            Link stages (already in bin) in order, with a queue, named from
+            names, between each consecutive pair.
+        """
+        for upstream, downstream, name in zip(stages, stages[1:], names):
+            queue = Gst.ElementFactory.make('queue', name)
+            queue.set_property('max-size-time', self.latency * Gst.MSECOND)
+            queue.set_property('max-size-buffers', 0)
+            queue.set_property('max-size-bytes', 0)
+            Gst.util_set_object_arg(queue, 'leaky', 'downstream')
+            queue.connect('overrun', self.on_overrun)
+            bin.add(queue)
+            upstream.link(queue)
+            queue.link(downstream)
+            self.queues.append(queue)
+
+    @staticmethod
+    def frame_duration(link_config):
+        """Return the duration (ms) of the link's encoded frames, or 0 for PCM"""
+        if link_config.encoding == 'opus':
+            return link_config.opus_framesize
+        return 0
+
+    def on_overrun(self, queue):
+        # Called from the upstream stage's thread as the oldest audio is dropped
+        self.overruns += 1
+
+    def get_stats(self):
+        """Return each queue's fill level (% of its latency) and the overrun count"""
+        levels = []
+        for queue in self.queues:
+            fill = 100 * queue.get_property('current-level-time') // max(queue.get_property('max-size-time'), 1)
+            levels.append('%s:%i' % (queue.get_name(), fill))
+        return {'queues': ','.join(levels), 'queue_overruns': self.overruns}
+
+    def close(self):
+        """Drop our references to the queues so the pipeline can be freed"""
+        self.queues = []
@@ -0,0 +1,25 @@
+from openob.gstreamer import Gst
+
+# Retransmissions (RFC 4588) are sent with their own payload type
+RTX_PAYLOAD_TYPE = 97
+
+
+def rtx_payload_type_map(payload_type):
+    """Map the audio payload type to its retransmission payload type"""
+    return Gst.Structure.new_from_string('application/x-rtp-pt-map, %i=(uint)%i' % (payload_type, RTX_PAYLOAD_TYPE))
+
+
+def rtx_caps(clock_rate, payload_type):
+    """Caps for the retransmission stream of an audio payload type"""
+    return Gst.Caps.from_string(
+        'application/x-rtp,media=(string)audio,encoding-name=(string)RTX,clock-rate=(int)%i,payload=(int)%i,apt=(int)%i'
+        % (clock_rate, RTX_PAYLOAD_TYPE, payload_type))
+
+
+def build_aux_bin(element, session):
+    """Wrap an rtprtxsend/rtprtxreceive element as an rtpbin auxiliary bin for a session"""
+    bin = Gst.Bin.new()
+    bin.add(element)
+    bin.add_pad(Gst.GhostPad.new('sink_%u' % session, element.get_static_pad('sink')))
+    bin.add_pad(Gst.GhostPad.new('src_%u' % session, element.get_static_pad('src')))
+    return bin
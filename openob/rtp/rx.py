@@ -1,9 +1,17 @@
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
-Gst.init(None)
-
+import struct
 from openob.logger import LoggerFactory
+from openob.gstreamer import Gst, GLib, GstNet, require_elements
+from openob.rtp.drift import DriftEstimator
+from openob.rtp.sync import build_sync_clock, use_sync_clock, ntp_to_ns
+from openob.rtp.cn import level_to_volume, parse_cn_level
+from openob.rtp.rtx import RTX_PAYLOAD_TYPE, build_aux_bin, rtx_caps, rtx_payload_type_map
+from openob.rtp.udp import configure_socket, socket_drops, udp_counters
+from openob.rtp.conversion import build_resampler, conversions_needed, describe_conversion, probe_caps
+from openob.rtp.queues import ThreadQueues
+
+# How far behind the newest sequence number a packet can be and still be
+# treated as a late or duplicate packet; a bigger jump back is a new sender
+REORDER_WINDOW = 100
 
 class RTPReceiver(object):
 
@@ -17,11 +25,23 @@ class RTPReceiver(object):
         self.logger = self.logger_factory.getLogger('node.%s.link.%s.%s' % (node_name, self.link_config.name, self.audio_interface.mode))
         self.logger.info('Creating reception pipeline')
 
-        self.build_pipeline()
+        self.pipeline = None
+        self.main_loop = None
+        self.thread_queues = None
+        self.bus_watch = None
+        self.drift_timeout = None
+        require_elements(self.required_elements())
+        try:
+            self.build_pipeline()
+        except Exception:
+            self.close()
+            raise
 
     def run(self):
         self.pipeline.set_state(Gst.State.PLAYING)
         self.logger.info('Listening for stream on %s:%i' % (self.link_config.receiver_host, self.link_config.port))
+        if self.drift is not None:
+            self.drift_timeout = GLib.timeout_add_seconds(1, self.update_drift_correction)
 
     def loop(self):
         try:
@@ -29,13 +49,144 @@ class RTPReceiver(object):
             self.main_loop.run()
         except Exception as e:
             self.logger.exception('Encountered a problem in the MainLoop, tearing down the pipeline: %s' % e)
-            self.pipeline.set_state(Gst.State.NULL)
+            self.close()
+
+    def close(self):
+        """
+            Tear down the pipeline and release everything it holds: sockets,
+            the audio device, the bus watch and any timeouts. Safe to call
+            more than once, and on a pipeline that failed part way through
+            being built.
+        """
+        if self.drift_timeout is not None:
+            GLib.source_remove(self.drift_timeout)
+            self.drift_timeout = None
+        if self.pipeline is None:
+            return
+        if self.bus_watch is not None:
+            bus = self.pipeline.get_bus()
+            bus.disconnect(self.bus_watch)
+            bus.remove_signal_watch()
+            self.bus_watch = None
+        self.pipeline.set_state(Gst.State.NULL)
+        # Signal handlers and probes on the pipeline refer back to us, so
+        # drop our references to it to let it (and its sockets) be freed
+        if self.thread_queues is not None:
+            self.thread_queues.close()
+        self.pipeline = self.transport = self.decoder = self.output = None
+        self.jitterbuffer = None
+        self.sync_clock = None
+        self.main_loop = None
+        self.logger.debug('Reception pipeline closed')
+
+    def required_elements(self):
+        """List the element factories this pipeline will be built from"""
+        sinks = {'auto': 'autoaudiosink', 'alsa': 'alsasink', 'jack': 'jackaudiosink', 'test': 'fakesink'}
+        elements = ['udpsrc', 'rtpbin', 'valve', 'audioresample', 'audioconvert', 'level']
+        if self.audio_interface.drift_correction:
+            elements += ['capssetter', 'capsfilter']
+        if self.audio_interface.type in sinks:
+            elements.append(sinks[self.audio_interface.type])
+        if self.link_config.encoding == 'opus':
+            elements += ['opusdec', 'rtpopusdepay']
+        elif self.link_config.encoding == 'pcm':
+            elements.append('rtpL16depay')
+            if self.link_config.silence_suppression:
+                elements += ['audiotestsrc', 'audiomixer', 'capsfilter']
+        if self.link_config.retransmission:
+            elements += ['rtprtxreceive', 'udpsink']
+        if self.link_config.thread_queues:
+            elements.append('queue')
+        return elements
+
+    def get_stats(self):
+        """Return a dict of reception statistics for status reporting"""
+        stats = {
+            'state': self.pipeline.get_state(0)[1].value_nick,
+            'levels': self.levels,
+            'packets': None,
+            'lost': None,
+            'jitter_buffer': None,
+        }
+        if self.jitterbuffer is not None:
+            jitterbuffer_stats = self.jitterbuffer.get_property('stats')
+            stats['packets'] = jitterbuffer_stats.get_value('num-pushed')
+            stats['lost'] = jitterbuffer_stats.get_value('num-lost')
+            stats['jitter_buffer'] = self.jitterbuffer.get_property('percent')
+            if self.link_config.retransmission:
+                # Lost packets are concealed; recovered ones were retransmitted in time
+                stats['rtx_requests'] = jitterbuffer_stats.get_value('rtx-count')
+                stats['recovered'] = jitterbuffer_stats.get_value('rtx-success-count')
+        if self.sync_clock is not None:
+            alignment_error = self.get_alignment_error()
+            if alignment_error is not None:
+                stats['alignment_error_ms'] = round(alignment_error / float(Gst.MSECOND), 3)
+        if self.drift is not None:
+            stats['drift_ppm'] = round(self.drift.ppm, 2)
+            stats['drift_correction_ppm'] = round(self.drift.correction_ppm, 2)
+        # Packets the kernel dropped before they reached us, eg because the
+        # socket's receive buffer overflowed; these never show up as lost
+        stats['socket_drops'] = socket_drops(self.transport.get_by_name('udpsrc'))
+        stats['rcvbuf_errors'] = udp_counters().get('RcvbufErrors')
+        if self.thread_queues is not None:
+            stats.update(self.thread_queues.get_stats())
+        return stats
+
+    def get_alignment_error(self):
+        """
+            Return how far (in ns) our playout is from the instant every
+            receiver of this link should be playing the same audio: the
+            sender's capture time on the shared clock plus the playout latency.
+            Returns None until a sender report has been received.
+        """
+        if self.ssrc is None:
+            return None
+        session = self.transport.get_by_name('rtpbin').emit('get-internal-session', 0)
+        source = session.emit('get-source-by-ssrc', self.ssrc) if session is not None else None
+        if source is None:
+            return None
+        source_stats = source.get_property('stats')
+        if not source_stats.get_value('have-sr'):
+            return None
+        depayloader_stats = self.decoder.get_by_name('depayloader').get_property('stats')
+
+        # Capture time of the most recently depayloaded buffer
+        rtp_delta = (depayloader_stats.get_value('timestamp') - source_stats.get_value('sr-rtptime')) & 0xffffffff
+        if rtp_delta >= 0x80000000:
+            rtp_delta -= 0x100000000
+        captured = ntp_to_ns(source_stats.get_value('sr-ntptime')) + rtp_delta * Gst.SECOND // source_stats.get_value('clock-rate')
+
+        intended = captured + self.playout_latency
+        actual = depayloader_stats.get_value('running-time-pts') + self.pipeline.get_latency()
+        return actual - intended
 
     def build_pipeline(self):
         self.pipeline = Gst.Pipeline.new('rx')
-        
+
         self.started = False
+        self.receiving = False
+        self.levels = []
+        self.jitterbuffer = None
+        self.drift = None
+        self.drift_rate = None
+        self.drift_seqnum = None
+        self.drift_timeout = None
+        self.ssrc = None
+        self.playout_latency = None
+        self.comfort_noise = self.link_config.encoding == 'pcm' and self.link_config.silence_suppression
+        self.in_silence = False
         bus = self.pipeline.get_bus()
+
+        self.sync_clock = build_sync_clock(self.link_config)
+        if self.sync_clock is not None:
+            use_sync_clock(self.pipeline, self.sync_clock)
+            # Every receiver renders at the capture time plus its pipeline
+            # latency, so they must all use the same latency rather than
+            # whatever their own decoders and sinks add up to
+            self.playout_latency = (self.link_config.jitter_buffer + self.link_config.playout_margin) * Gst.MSECOND
+            self.pipeline.set_latency(self.playout_latency)
+            self.logger.info('Synchronised playout enabled (%s clock, %ims latency)' % (
+                self.link_config.sync, self.playout_latency // Gst.MSECOND))
         
         self.transport = self.build_transport()
         self.decoder = self.build_decoder()
@@ -44,11 +195,19 @@ class RTPReceiver(object):
         self.pipeline.add(self.transport)
         self.pipeline.add(self.decoder)
         self.pipeline.add(self.output)
-        self.transport.link(self.decoder)
-        self.decoder.link(self.output)
+        if self.link_config.thread_queues:
+            # Decoding and playout each get their own thread, separate from
+            # the jitter buffer's
+            self.thread_queues = ThreadQueues(
+                self.link_config.queue_latency, ThreadQueues.frame_duration(self.link_config))
+            self.thread_queues.link(self.pipeline, [self.transport, self.decoder, self.output], ['decode', 'playout'])
+            self.logger.info('Thread queues enabled, up to %ims each' % self.thread_queues.latency)
+        else:
+            self.transport.link(self.decoder)
+            self.decoder.link(self.output)
 
         bus.add_signal_watch()
-        bus.connect('message', self.on_message)
+        self.bus_watch = bus.connect('message', self.on_message)
 
     def build_audio_interface(self):
         self.logger.debug('Building audio output bin')
@@ -75,28 +234,97 @@ class RTPReceiver(object):
 
         bin.add(sink)
         
-        # Audio resampling and conversion
-        resample = Gst.ElementFactory.make('audioresample')
-        resample.set_property('quality', 9)
-        bin.add(resample)
-
-        convert = Gst.ElementFactory.make('audioconvert')
-        bin.add(convert)
-
         # Our level monitor, also used for continuous audio
         level = Gst.ElementFactory.make('level')
         level.set_property('message', True)
         level.set_property('interval', 1000000000)
         bin.add(level)
 
-        resample.link(convert)
-        convert.link(level)
+        # Audio resampling and conversion, only if the decoded audio isn't
+        # already something the output (and level) accepts
+        output_caps = level.get_static_pad('sink').query_caps(None)
+        sink_caps = probe_caps(sink, 'sink')
+        if sink_caps is not None:
+            output_caps = output_caps.intersect(sink_caps)
         level.link(sink)
+        source_caps = self.decoded_caps()
+        if self.comfort_noise:
+            # Mix in locally generated noise while the transmitter is sending
+            # comfort noise packets in place of silent audio. The noise is
+            # live, so it would otherwise fix the mixer's rate and channels
+            # before any audio arrives; hold both to the stream's.
+            mix_caps = Gst.Caps.from_string('audio/x-raw,rate=%i,channels=%i' % (self.clock_rate, self.channels or 1))
+            mixer = Gst.ElementFactory.make('audiomixer', 'mixer')
+            mixer_filter = Gst.ElementFactory.make('capsfilter', 'mixer_caps')
+            mixer_filter.set_property('caps', mix_caps)
+            source_caps = mixer.get_static_pad('src').query_caps(None).intersect(mix_caps)
+        resample, convert = conversions_needed(source_caps, output_caps)
+        elements = []
+        if self.comfort_noise:
+            elements += [mixer, mixer_filter]
+        if self.drift is not None:
+            # Rewrites the rate the resampler believes it is being fed, so
+            # that it absorbs the drift between the sender's clock and ours
+            elements.append(Gst.ElementFactory.make('capssetter', 'drift'))
+            resample = True
+        if resample:
+            elements.append(build_resampler(self.link_config))
+        if self.drift is not None:
+            # Holds the resampler's output at the rate first negotiated with
+            # the output (see update_drift_correction), so that it resamples
+            # rather than passing the corrected rate on to the sink
+            elements.append(Gst.ElementFactory.make('capsfilter', 'drift_output'))
+        if convert:
+            elements.append(Gst.ElementFactory.make('audioconvert'))
+        elements.append(level)
+        self.logger.info('Output audio %s' % describe_conversion(resample, convert))
+
+        for element in elements[:-1]:
+            bin.add(element)
+        for upstream, downstream in zip(elements, elements[1:]):
+            upstream.link(downstream)
+
+        if self.comfort_noise:
+            noise = Gst.ElementFactory.make('audiotestsrc', 'comfortnoise')
+            noise.set_property('wave', 'pink-noise')
+            noise.set_property('is-live', True)
+            noise.set_property('volume', 0.0)
+            bin.add(noise)
+            noise_convert = Gst.ElementFactory.make('audioconvert')
+            bin.add(noise_convert)
+            noise_filter = Gst.ElementFactory.make('capsfilter')
+            noise_filter.set_property('caps', mix_caps)
+            bin.add(noise_filter)
+            noise.link(noise_convert)
+            noise_convert.link(noise_filter)
+            noise_filter.link(mixer)
+
+            audio_convert = Gst.ElementFactory.make('audioconvert')
+            bin.add(audio_convert)
+            audio_convert.link(mixer)
+            output_sink = audio_convert.get_static_pad('sink')
+        else:
+            output_sink = elements[0].get_static_pad('sink')
 
-        bin.add_pad(Gst.GhostPad.new('sink', resample.get_static_pad('sink')))
+        bin.add_pad(Gst.GhostPad.new('sink', output_sink))
+        # Level messages also cover the comfort noise, so note when audio
+        # from the stream itself first arrives
+        bin.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self.output_receiving_probe)
 
         return bin
 
+    def decoded_caps(self):
+        """Return the raw audio caps the decoder can produce for this stream"""
+        caps = self.decoder.get_static_pad('src').query_caps(None)
+        if self.link_config.encoding == 'pcm':
+            # Linear audio can only come out as it was sent
+            raw_caps = Gst.Caps.new_empty_simple('audio/x-raw')
+            raw_caps.set_value('rate', self.clock_rate)
+            if self.channels is not None:
+                raw_caps.set_value('channels', self.channels)
+            caps = caps.intersect(raw_caps)
+        return caps
+
     def build_decoder(self):
         self.logger.debug('Building decoder bin')
         bin = Gst.Bin.new('decoder')
@@ -143,25 +371,183 @@ class RTPReceiver(object):
             udpsrc.set_property('auto_multicast', True)
             udpsrc.set_property('multicast_group', self.link_config.receiver_host)
             self.logger.info('Multicast mode enabled')
+        self.configure_socket(udpsrc, self.link_config.receive_buffer)
         bin.add(udpsrc)
 
+        if self.audio_interface.drift_correction:
+            self.drift = DriftEstimator(udpsrc_caps.get_structure(0).get_value('clock-rate'))
+            udpsrc.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.udpsrc_drift_probe)
+            self.logger.info('Clock drift correction enabled')
+
+        if self.comfort_noise:
+            udpsrc.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.udpsrc_cn_probe)
+
         rtpbin = Gst.ElementFactory.make('rtpbin', 'rtpbin')
         rtpbin.set_property('latency', self.link_config.jitter_buffer)
         rtpbin.set_property('autoremove', True)
         rtpbin.set_property('do-lost', True)
         bin.add(rtpbin)
 
+        self.payload_type = udpsrc_caps.get_structure(0).get_value('payload')
+        self.clock_rate = udpsrc_caps.get_structure(0).get_value('clock-rate')
+        self.channels = None
+        if udpsrc_caps.get_structure(0).has_field('channels'):
+            self.channels = udpsrc_caps.get_structure(0).get_value('channels')
+        rtpbin.connect('request-pt-map', self.rtpbin_request_pt_map, udpsrc_caps)
+        if self.link_config.retransmission:
+            # Ask the transmitter (with RTCP NACKs) for packets missing from
+            # the jitter buffer, while there is still time to play them
+            rtpbin.set_property('do-retransmission', True)
+            Gst.util_set_object_arg(rtpbin, 'rtp-profile', 'avpf')
+            rtpbin.connect('request-aux-receiver', self.rtpbin_request_aux_receiver)
+
+            rtcpsink = Gst.ElementFactory.make('udpsink', 'rtcpsink')
+            rtcpsink.set_property('port', self.link_config.port + 1)
+            rtcpsink.set_property('sync', False)
+            rtcpsink.set_property('async', False)
+            configure_socket(rtcpsink, dscp=self.link_config.dscp)
+            if self.audio_interface.bind_address:
+                rtcpsink.set_property('bind-address', self.audio_interface.bind_address)
+            bin.add(rtcpsink)
+            udpsrc.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.udpsrc_sender_probe)
+            self.logger.info('Retransmission enabled')
+
         udpsrc.link_pads('src', rtpbin, 'recv_rtp_sink_0')
 
+        if self.link_config.retransmission:
+            rtpbin.link_pads('send_rtcp_src_0', rtcpsink, 'sink')
+
+        if self.sync_clock is not None or self.link_config.retransmission:
+            rtcpsrc = Gst.ElementFactory.make('udpsrc', 'rtcpsrc')
+            rtcpsrc.set_property('port', self.link_config.port + 1)
+            if self.link_config.multicast:
+                rtcpsrc.set_property('auto_multicast', True)
+                rtcpsrc.set_property('multicast_group', self.link_config.receiver_host)
+            self.configure_socket(rtcpsrc)
+            bin.add(rtcpsrc)
+
+            rtcpsrc.link_pads('src', rtpbin, 'recv_rtcp_sink_0')
+
+        if self.sync_clock is not None:
+            # Play out at the sender's capture time (from its RTCP sender
+            # reports) plus the link latency, as every other receiver will
+            rtpbin.set_property('ntp-sync', True)
+            Gst.util_set_object_arg(rtpbin, 'ntp-time-source', 'clock-time')
+            Gst.util_set_object_arg(rtpbin, 'buffer-mode', 'synced')
+
         valve = Gst.ElementFactory.make('valve', 'valve')
         bin.add(valve)
         
         bin.add_pad(Gst.GhostPad.new('src', valve.get_static_pad('src')))
         # Attach callbacks for dynamic pads (RTP output) and busses
         rtpbin.connect('pad-added', self.rtpbin_pad_added)
+        rtpbin.connect('new-jitterbuffer', self.rtpbin_new_jitterbuffer)
 
         return bin
 
+    def configure_socket(self, udpsrc, buffer_size=0):
+        """Apply the receive buffer size, and our local address or interface, to a udpsrc"""
+        if self.link_config.multicast:
+            configure_socket(udpsrc, buffer_size, multicast_iface=self.audio_interface.multicast_iface)
+        else:
+            configure_socket(udpsrc, buffer_size)
+            if self.audio_interface.bind_address:
+                udpsrc.set_property('address', self.audio_interface.bind_address)
+
+    def rtpbin_request_pt_map(self, rtpbin, session, pt, caps):
+        # Everything arriving is our audio stream, or its retransmissions
+        if pt == RTX_PAYLOAD_TYPE and self.link_config.retransmission:
+            return rtx_caps(self.clock_rate, self.payload_type)
+        return caps
+
+    def rtpbin_request_aux_receiver(self, rtpbin, session):
+        rtxreceive = Gst.ElementFactory.make('rtprtxreceive', 'rtxreceive')
+        rtxreceive.set_property('payload-type-map', rtx_payload_type_map(self.payload_type))
+        return build_aux_bin(rtxreceive, session)
+
+    def udpsrc_sender_probe(self, pad, info):
+        # Learn the transmitter's address from its packets, so that we can
+        # send our RTCP (including retransmission requests) back to it
+        meta = GstNet.buffer_get_net_address_meta(info.get_buffer())
+        if meta is None:
+            return Gst.PadProbeReturn.OK
+        host = meta.addr.get_address().to_string()
+        self.transport.get_by_name('rtcpsink').set_property('host', host)
+        self.logger.info('Sending RTCP to transmitter at %s:%i' % (host, self.link_config.port + 1))
+        return Gst.PadProbeReturn.REMOVE
+
+    def udpsrc_drift_probe(self, pad, info):
+        # Sample RTP timestamps against their local arrival time. Only audio
+        # packets arriving in order count: retransmissions carry the original
+        # (older) timestamp, comfort noise has its own, and duplicates or
+        # reordered packets arrive late.
+        buffer = info.get_buffer()
+        if buffer.pts == Gst.CLOCK_TIME_NONE or buffer.get_size() < 12:
+            return Gst.PadProbeReturn.OK
+        payload_type, seqnum, rtp_timestamp = struct.unpack('!xBHI', buffer.extract_dup(0, 8))
+        if payload_type & 0x7f != self.payload_type:
+            return Gst.PadProbeReturn.OK
+        if self.drift_seqnum is not None:
+            step = (seqnum - self.drift_seqnum) & 0xffff
+            if step == 0 or step >= 0x10000 - REORDER_WINDOW:
+                return Gst.PadProbeReturn.OK
+        self.drift_seqnum = seqnum
+        arrival_time = buffer.pts / float(Gst.SECOND)
+        if self.drift.wants_sample(arrival_time):
+            self.drift.add_sample(rtp_timestamp, arrival_time)
+        return Gst.PadProbeReturn.OK
+
+    def udpsrc_cn_probe(self, pad, info):
+        # Comfort noise packets set the level of our noise generator and are
+        # dropped here; the arrival of audio again silences it
+        buffer = info.get_buffer()
+        level = parse_cn_level(buffer.extract_dup(0, min(buffer.get_size(), 13)))
+        noise = self.output.get_by_name('comfortnoise')
+        if level is None:
+            if self.in_silence:
+                self.in_silence = False
+                noise.set_property('volume', 0.0)
+            return Gst.PadProbeReturn.OK
+        self.in_silence = True
+        noise.set_property('volume', level_to_volume(level))
+        return Gst.PadProbeReturn.DROP
+
+    def output_receiving_probe(self, pad, info):
+        self.receiving = True
+        return Gst.PadProbeReturn.REMOVE
+
+    def update_drift_correction(self):
+        """Re-estimate clock drift and adjust the resampler to match"""
+        if self.drift.estimate() is None:
+            return True
+        drift_caps = self.output.get_by_name('drift')
+        caps = drift_caps.get_static_pad('sink').get_current_caps()
+        if caps is None:
+            return True
+        if self.drift_rate is None:
+            # Before the first correction, pin the output to the rate it is
+            # running at; only the resampler's input rate varies after this
+            output_filter = self.output.get_by_name('drift_output')
+            output_caps = output_filter.get_static_pad('sink').get_current_caps()
+            if output_caps is None:
+                return True
+            output_filter.set_property('caps', Gst.Caps.from_string(
+                'audio/x-raw,rate=%i' % output_caps.get_structure(0).get_value('rate')))
+        rate = self.drift.resampler_rate(caps.get_structure(0).get_value('rate'))
+        if rate != self.drift_rate:
+            self.logger.debug('Clock drift %.2fppm, resampling from %iHz' % (self.drift.ppm, rate))
+            self.drift_rate = rate
+            drift_caps.set_property('caps', Gst.Caps.from_string('audio/x-raw,rate=%i' % rate))
+        return True
+
+    def rtpbin_new_jitterbuffer(self, rtpbin, jitterbuffer, session, ssrc):
+        # Keep hold of the jitterbuffer so we can report on its stats
+        self.jitterbuffer = jitterbuffer
+        self.ssrc = ssrc
+        if self.link_config.retransmission:
+            # Bound how hard we try to recover each lost packet
+            jitterbuffer.set_property('rtx-max-retries', self.link_config.rtx_max_retries)
+
     # Our RTPbin won't give us an audio pad till it receives, so we need to
     # attach it here
     def rtpbin_pad_added(self, obj, pad):
@@ -174,11 +560,19 @@ class RTPReceiver(object):
         rtpbin.link(valve)
 
     def on_message(self, bus, message):
+        if message.type == Gst.MessageType.LATENCY and self.playout_latency is not None:
+            query = Gst.Query.new_latency()
+            if self.pipeline.query(query):
+                live, min_latency, max_latency = query.parse_latency()
+                if min_latency > self.playout_latency:
+                    self.logger.warning('This receiver needs %ims latency, more than the %ims allowed for synchronised playout; raise --playout_margin' % (
+                        min_latency // Gst.MSECOND, self.playout_latency // Gst.MSECOND))
         if message.type == Gst.MessageType.ELEMENT:
             struct = message.get_structure()
             if struct != None:
                 if struct.get_name() == 'level':
-                    if self.started is False:
+                    self.levels = list(struct.get_value('peak'))
+                    if self.started is False and self.receiving:
                         self.started = True
                         if len(struct.get_value('peak')) == 1:
                             self.logger.info('Receiving mono audio transmission')
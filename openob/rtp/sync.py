@@ -0,0 +1,45 @@
+from openob.gstreamer import Gst, GstNet
+
+# How long to wait for a network clock to synchronise before giving up
+SYNC_TIMEOUT = 10
+
+
+def build_sync_clock(link_config):
+    """
+        Return the shared reference clock for a link, or None if synchronised
+        playout isn't enabled. Every Node on the link must build the same
+        clock for their running times to agree.
+    """
+    sync = link_config.get('sync')
+    if sync in (None, 'none'):
+        return None
+    if sync == 'system':
+        # Wall-clock time; assumes the hosts are themselves NTP/PTP disciplined
+        return Gst.SystemClock(clock_type=Gst.ClockType.REALTIME)
+
+    if sync == 'ntp':
+        clock = GstNet.NtpClock.new('openob-ntp', link_config.sync_server, 123, 0)
+    elif sync == 'ptp':
+        if not GstNet.ptp_init(GstNet.PTP_CLOCK_ID_NONE, None):
+            raise RuntimeError('Unable to initialise PTP support')
+        clock = GstNet.PtpClock.new('openob-ptp', link_config.ptp_domain)
+    else:
+        raise ValueError('Unknown sync mode %s' % sync)
+    if not clock.wait_for_sync(SYNC_TIMEOUT * Gst.SECOND):
+        raise RuntimeError('Reference clock (%s) did not synchronise within %is' % (sync, SYNC_TIMEOUT))
+    return clock
+
+
+def use_sync_clock(pipeline, clock):
+    """
+        Run a pipeline against a shared clock with a base time of 0, so that
+        running time is the same on every Node sharing the clock.
+    """
+    pipeline.use_clock(clock)
+    pipeline.set_start_time(Gst.CLOCK_TIME_NONE)
+    pipeline.set_base_time(0)
+
+
+def ntp_to_ns(ntptime):
+    """Convert a 64-bit NTP format timestamp into nanoseconds"""
+    return (ntptime >> 32) * Gst.SECOND + ((ntptime & 0xffffffff) * Gst.SECOND >> 32)
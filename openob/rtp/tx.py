@@ -1,10 +1,13 @@
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
-Gst.init(None)
-
+import random
 import time
 from openob.logger import LoggerFactory
+from openob.gstreamer import Gst, GLib, require_elements
+from openob.rtp.sync import build_sync_clock, use_sync_clock
+from openob.rtp.cn import CN_CAPS, CN_INTERVAL, CN_PAYLOAD_TYPE, build_cn_packet
+from openob.rtp.rtx import build_aux_bin, rtx_payload_type_map
+from openob.rtp.udp import configure_socket, udp_counters
+from openob.rtp.conversion import build_resampler, conversions_needed, describe_conversion, probe_caps
+from openob.rtp.queues import ThreadQueues
 
 class RTPTransmitter(object):
 
@@ -18,17 +21,35 @@ class RTPTransmitter(object):
         self.logger = self.logger_factory.getLogger('node.%s.link.%s.%s' % (node_name, self.link_config.name, self.audio_interface.mode))
         self.logger.info('Creating transmission pipeline')
 
-        self.build_pipeline()
-
-    def run(self):
+        self.pipeline = None
+        self.bus_watch = None
+        self.sync_watch = None
+        self.cn_timeout = None
+        self.thread_queues = None
+        require_elements(self.required_elements())
+        try:
+            self.build_pipeline()
+        except Exception:
+            self.close()
+            raise
+
+    def run(self, waiting=None, interval=5):
+        """
+            Start the pipeline and wait for its caps. If given, waiting is
+            called every interval seconds until they're known.
+        """
         self.pipeline.set_state(Gst.State.PLAYING)
         # Gst.debug_bin_to_dot_file(self.pipeline, Gst.DebugGraphDetails.ALL, 'tx-graph')
         
+        last_called = time.time()
         while self.caps == None:
             caps = self.transport.get_by_name('udpsink').get_static_pad('sink').get_property('caps')
 
             if caps == None:
                 self.logger.warn('Waiting for audio interface/caps')
+                if waiting is not None and time.time() - last_called >= interval:
+                    waiting()
+                    last_called = time.time()
                 time.sleep(0.1)
             else:
                 self.caps = caps.to_string()
@@ -39,29 +60,142 @@ class RTPTransmitter(object):
             loop.run()
         except Exception as e:
             self.logger.exception('Encountered a problem in the MainLoop, tearing down the pipeline: %s' % e)
-            self.pipeline.set_state(Gst.State.NULL)
+            self.close()
+
+    def close(self):
+        """
+            Tear down the pipeline and release everything it holds: sockets,
+            the audio device, the bus watch and any timeouts. Safe to call
+            more than once, and on a pipeline that failed part way through
+            being built.
+        """
+        if self.cn_timeout is not None:
+            GLib.source_remove(self.cn_timeout)
+            self.cn_timeout = None
+        if self.pipeline is None:
+            return
+        if self.bus_watch is not None:
+            bus = self.pipeline.get_bus()
+            bus.disconnect(self.bus_watch)
+            bus.remove_signal_watch()
+            self.bus_watch = None
+        if self.sync_watch is not None:
+            bus = self.pipeline.get_bus()
+            bus.disconnect(self.sync_watch)
+            bus.disable_sync_message_emission()
+            self.sync_watch = None
+        self.pipeline.set_state(Gst.State.NULL)
+        # Signal handlers and probes on the pipeline refer back to us, so
+        # drop our references to it to let it (and its sockets) be freed
+        if self.thread_queues is not None:
+            self.thread_queues.close()
+        self.pipeline = self.source = self.encoder = self.transport = None
+        self.sync_clock = None
+        self.logger.debug('Transmission pipeline closed')
+
+    def required_elements(self):
+        """List the element factories this pipeline will be built from"""
+        sources = {'auto': 'autoaudiosrc', 'alsa': 'alsasrc', 'jack': 'jackaudiosrc', 'test': 'audiotestsrc'}
+        elements = ['level', 'audioresample', 'audioconvert', 'capsfilter', 'rtpbin', 'udpsink']
+        if self.audio_interface.type in sources:
+            elements.append(sources[self.audio_interface.type])
+        if self.link_config.encoding == 'opus':
+            elements += ['opusenc', 'rtpopuspay']
+        elif self.link_config.encoding == 'pcm':
+            elements.append('rtpL16pay')
+            if self.link_config.silence_suppression:
+                elements += ['removesilence', 'tee', 'valve', 'fakesink', 'appsrc', 'funnel']
+        if self.link_config.retransmission:
+            elements += ['rtprtxsend', 'udpsrc']
+        if self.link_config.thread_queues:
+            elements.append('queue')
+        return elements
+
+    def get_stats(self):
+        """Return a dict of transmission statistics for status reporting"""
+        stats = {
+            'state': self.pipeline.get_state(0)[1].value_nick,
+            'levels': self.levels,
+            'packets': None,
+            'lost': None,
+            'jitter_buffer': None,
+        }
+        session = self.transport.get_by_name('rtpbin').emit('get-internal-session', 0)
+        if session is not None:
+            source_stats = session.get_property('internal-source').get_property('stats')
+            stats['packets'] = source_stats.get_value('packets-sent')
+        rtxsend = self.transport.get_by_name('rtxsend')
+        if rtxsend is not None:
+            stats['rtx_requests'] = rtxsend.get_property('num-rtx-requests')
+            stats['retransmitted'] = rtxsend.get_property('num-rtx-packets')
+        if self.silence_suppression:
+            stats['bytes_saved'] = self.get_bytes_saved()
+        # Host-wide; the kernel doesn't count send errors per socket
+        stats['sndbuf_errors'] = udp_counters().get('SndbufErrors')
+        if self.thread_queues is not None:
+            stats.update(self.thread_queues.get_stats())
+        return stats
+
+    def get_bytes_saved(self):
+        """Estimate the payload bytes not sent thanks to silence suppression"""
+        silence_time = self.silence_time
+        if self.silence_started is not None:
+            silence_time += time.time() - self.silence_started
+        return int(silence_time * self.pcm_byte_rate) - self.cn_bytes
 
     def build_pipeline(self):
         self.pipeline = Gst.Pipeline.new('tx')
 
         self.started = False
         self.caps = None
+        self.levels = []
+        self.rms = []
+
+        # Silence suppression state (PCM only; Opus has DTX)
+        self.silence_suppression = self.link_config.encoding == 'pcm' and self.link_config.silence_suppression
+        self.silence_started = None
+        self.silence_time = 0.0
+        self.pcm_byte_rate = 0
+        self.cn_bytes = 0
+        # Comfort noise is sent as a stream of its own, so that it doesn't
+        # disturb the audio stream's sequence numbers
+        self.cn_ssrc = random.getrandbits(32)
+        self.cn_seqnum = random.getrandbits(16)
+        self.cn_timeout = None
 
         bus = self.pipeline.get_bus()
 
-        self.source = self.build_audio_interface()
+        self.sync_clock = build_sync_clock(self.link_config)
+        if self.sync_clock is not None:
+            use_sync_clock(self.pipeline, self.sync_clock)
+            self.logger.info('Synchronised playout enabled (%s clock)' % self.link_config.sync)
+
+        # The encoder is built first so the input knows what it must provide
         self.encoder = self.build_encoder()
+        self.source = self.build_audio_interface()
         self.transport = self.build_transport()
         
         self.pipeline.add(self.source)
         self.pipeline.add(self.encoder)
         self.pipeline.add(self.transport)
-        self.source.link(self.encoder)
-        self.encoder.link(self.transport)
+        if self.link_config.thread_queues:
+            # Capture, encoding and sending each get their own thread
+            self.thread_queues = ThreadQueues(
+                self.link_config.queue_latency, ThreadQueues.frame_duration(self.link_config))
+            self.thread_queues.link(self.pipeline, [self.source, self.encoder, self.transport], ['encode', 'send'])
+            self.logger.info('Thread queues enabled, up to %ims each' % self.thread_queues.latency)
+        else:
+            self.source.link(self.encoder)
+            self.encoder.link(self.transport)
 
         # Connect our bus up
         bus.add_signal_watch()
-        bus.connect('message', self.on_message)
+        self.bus_watch = bus.connect('message', self.on_message)
+        if self.silence_suppression:
+            # The valve is switched from the streaming thread, as soon as
+            # silence starts or ends, rather than via the main loop
+            bus.enable_sync_message_emission()
+            self.sync_watch = bus.connect('sync-message::element', self.on_sync_message)
 
     def build_audio_interface(self):
         self.logger.debug('Building audio input bin')
@@ -96,14 +230,6 @@ class RTPTransmitter(object):
         level.set_property('interval', 1000000000)
         bin.add(level)
 
-        # Audio resampling and conversion
-        resample = Gst.ElementFactory.make('audioresample')
-        resample.set_property('quality', 9)  # SRC
-        bin.add(resample)
-
-        convert = Gst.ElementFactory.make('audioconvert')
-        bin.add(convert)
-
         # Add a capsfilter to allow specification of input sample rate
         capsfilter = Gst.ElementFactory.make('capsfilter')
 
@@ -117,10 +243,22 @@ class RTPTransmitter(object):
         capsfilter.set_property('caps', caps)
         bin.add(capsfilter)
 
-        source.link(level)
-        level.link(resample)
-        resample.link(convert)
-        convert.link(capsfilter)
+        # Audio resampling and conversion, only if the input can't already
+        # provide something the encoder accepts
+        encoder_caps = self.encoder.get_static_pad('sink').query_caps(None).intersect(caps)
+        resample, convert = conversions_needed(probe_caps(source, 'src'), encoder_caps)
+        elements = [source, level]
+        if resample:
+            elements.append(build_resampler(self.link_config))
+        if convert:
+            elements.append(Gst.ElementFactory.make('audioconvert'))
+        elements.append(capsfilter)
+        self.logger.info('Input audio %s' % describe_conversion(resample, convert))
+
+        for element in elements[2:-1]:
+            bin.add(element)
+        for upstream, downstream in zip(elements, elements[1:]):
+            upstream.link(downstream)
 
         bin.add_pad(Gst.GhostPad.new('src', capsfilter.get_static_pad('src')))
 
@@ -145,6 +283,23 @@ class RTPTransmitter(object):
         elif self.link_config.encoding == 'pcm':
             # we have no encoder for PCM operation
             payloader = Gst.ElementFactory.make('rtpL16pay', 'payloader')
+            if self.silence_suppression:
+                # Stop sending audio once the input has been silent for a
+                # second; comfort noise packets are sent in its place.
+                # removesilence only handles mono, so it listens to a mono
+                # copy of the audio and the full stream is gated by a valve
+                tee = Gst.ElementFactory.make('tee')
+                vad_convert = Gst.ElementFactory.make('audioconvert')
+                vad = Gst.ElementFactory.make('removesilence', 'vad')
+                vad.set_property('remove', False)
+                vad.set_property('silent', False)
+                vad.set_property('threshold', self.link_config.silence_threshold)
+                vad.set_property('minimum-silence-time', Gst.SECOND)
+                vad_sink = Gst.ElementFactory.make('fakesink')
+                vad_sink.set_property('sync', False)
+                vad_sink.set_property('async', False)
+                valve = Gst.ElementFactory.make('valve', 'vad_valve')
+                self.logger.info('Silence suppression enabled below %idB' % self.link_config.silence_threshold)
         else:
             self.logger.critical('Unknown encoding type %s' % self.link_config.encoding)
 
@@ -154,6 +309,17 @@ class RTPTransmitter(object):
             bin.add(encoder)
             encoder.link(payloader)
             bin.add_pad(Gst.GhostPad.new('sink', encoder.get_static_pad('sink')))
+        elif 'vad' in locals():
+            for element in [tee, vad_convert, vad, vad_sink, valve]:
+                bin.add(element)
+            # tee pushes to its branches in the order they were linked, so
+            # the valve is set for each buffer before that buffer reaches it
+            tee.link(vad_convert)
+            vad_convert.link(vad)
+            vad.link(vad_sink)
+            tee.link(valve)
+            valve.link(payloader)
+            bin.add_pad(Gst.GhostPad.new('sink', tee.get_static_pad('sink')))
         else:
             bin.add_pad(Gst.GhostPad.new('sink', payloader.get_static_pad('sink')))
 
@@ -170,6 +336,13 @@ class RTPTransmitter(object):
         rtpbin.set_property('latency', 0)
         bin.add(rtpbin)
 
+        if self.link_config.retransmission:
+            # Keep a short history of sent packets to answer RTCP NACKs from
+            # receivers; this must be hooked up before the session is created
+            Gst.util_set_object_arg(rtpbin, 'rtp-profile', 'avpf')
+            rtpbin.connect('request-aux-sender', self.rtpbin_request_aux_sender)
+            self.logger.info('Retransmission enabled with %ims history' % self.link_config.rtx_history)
+
         # TODO: Add a tee here, and sort out creating multiple UDP sinks for multipath
         udpsink = Gst.ElementFactory.make('udpsink', 'udpsink')
         udpsink.set_property('host', self.link_config.receiver_host)
@@ -179,19 +352,81 @@ class RTPTransmitter(object):
         if self.link_config.multicast:
             udpsink.set_property('auto_multicast', True)
             self.logger.info('Multicast mode enabled')
+        self.configure_socket(udpsink, self.link_config.send_buffer)
         bin.add(udpsink)
 
-        bin.add_pad(Gst.GhostPad.new('sink', rtpbin.get_request_pad('send_rtp_sink_0')))
+        rtp_sink = rtpbin.get_request_pad('send_rtp_sink_0')
+        if self.silence_suppression:
+            # Comfort noise packets are pushed in alongside the audio
+            funnel = Gst.ElementFactory.make('funnel', 'funnel')
+            bin.add(funnel)
+            cnsrc = Gst.ElementFactory.make('appsrc', 'cnsrc')
+            cnsrc.set_property('format', Gst.Format.TIME)
+            cnsrc.set_property('is-live', True)
+            cnsrc.set_property('do-timestamp', True)
+            bin.add(cnsrc)
+            cnsrc.link(funnel)
+            funnel.get_static_pad('src').link(rtp_sink)
+            bin.add_pad(Gst.GhostPad.new('sink', funnel.get_request_pad('sink_%u')))
+        else:
+            bin.add_pad(Gst.GhostPad.new('sink', rtp_sink))
 
         rtpbin.link_pads('send_rtp_src_0', udpsink, 'sink')
 
+        if self.sync_clock is not None:
+            # Sender reports carry the shared clock time each RTP timestamp
+            # was captured at, which receivers use to align their playout
+            Gst.util_set_object_arg(rtpbin, 'ntp-time-source', 'clock-time')
+            rtpbin.set_property('rtcp-sync-send-time', False)
+
+        if self.sync_clock is not None or self.link_config.retransmission:
+            rtcpsink = Gst.ElementFactory.make('udpsink', 'rtcpsink')
+            rtcpsink.set_property('host', self.link_config.receiver_host)
+            rtcpsink.set_property('port', self.link_config.port + 1)
+            rtcpsink.set_property('sync', False)
+            rtcpsink.set_property('async', False)
+            if self.link_config.multicast:
+                rtcpsink.set_property('auto_multicast', True)
+            self.configure_socket(rtcpsink)
+            bin.add(rtcpsink)
+
+            rtpbin.link_pads('send_rtcp_src_0', rtcpsink, 'sink')
+
+        if self.link_config.retransmission:
+            # Receivers send their RTCP, including NACKs, back to us here
+            rtcpsrc = Gst.ElementFactory.make('udpsrc', 'rtcpsrc')
+            rtcpsrc.set_property('port', self.link_config.port + 1)
+            if self.audio_interface.bind_address:
+                rtcpsrc.set_property('address', self.audio_interface.bind_address)
+            bin.add(rtcpsrc)
+
+            rtcpsrc.link_pads('src', rtpbin, 'recv_rtcp_sink_0')
+
         return bin
 
+    def configure_socket(self, udpsink, buffer_size=0):
+        """Apply the link's socket options, and our local address, to a udpsink"""
+        multicast = self.link_config.multicast
+        configure_socket(
+            udpsink, buffer_size, self.link_config.dscp,
+            multicast_ttl=self.link_config.multicast_ttl if multicast else None,
+            multicast_iface=self.audio_interface.multicast_iface if multicast else None)
+        if self.audio_interface.bind_address:
+            udpsink.set_property('bind-address', self.audio_interface.bind_address)
+
+    def rtpbin_request_aux_sender(self, rtpbin, session):
+        rtxsend = Gst.ElementFactory.make('rtprtxsend', 'rtxsend')
+        rtxsend.set_property('payload-type-map', rtx_payload_type_map(self.encoder.get_by_name('payloader').get_property('pt')))
+        rtxsend.set_property('max-size-time', self.link_config.rtx_history)
+        return build_aux_bin(rtxsend, session)
+
     def on_message(self, bus, message):
         if message.type == Gst.MessageType.ELEMENT:
             struct = message.get_structure()
             if struct != None:
                 if struct.get_name() == 'level':
+                    self.levels = list(struct.get_value('peak'))
+                    self.rms = list(struct.get_value('rms'))
                     if self.started is False:
                         self.started = True
                         if len(struct.get_value('peak')) == 1:
@@ -203,6 +438,62 @@ class RTPTransmitter(object):
                             self.logger.debug('Level: %.2f', struct.get_value('peak')[0])
                         else:
                             self.logger.debug('Levels: L %.2f R %.2f' % (struct.get_value('peak')[0], struct.get_value('peak')[1]))
+                if struct.get_name() == 'removesilence':
+                    if struct.has_field('silence_detected'):
+                        self.start_comfort_noise()
+                    elif struct.has_field('silence_finished'):
+                        self.stop_comfort_noise()
+        return True
+
+    def on_sync_message(self, bus, message):
+        struct = message.get_structure()
+        if struct is not None and struct.get_name() == 'removesilence':
+            if struct.has_field('silence_detected'):
+                self.encoder.get_by_name('vad_valve').set_property('drop', True)
+            elif struct.has_field('silence_finished'):
+                self.encoder.get_by_name('vad_valve').set_property('drop', False)
+
+    def start_comfort_noise(self):
+        if self.silence_started is not None:
+            return
+        self.logger.debug('Silence detected, sending comfort noise')
+        caps = self.encoder.get_by_name('payloader').get_static_pad('sink').get_current_caps()
+        if caps is not None:
+            structure = caps.get_structure(0)
+            self.pcm_byte_rate = structure.get_value('rate') * structure.get_value('channels') * 2
+        self.silence_started = time.time()
+        self.send_comfort_noise()
+        self.cn_timeout = GLib.timeout_add(CN_INTERVAL, self.send_comfort_noise)
+
+    def stop_comfort_noise(self):
+        if self.silence_started is None:
+            return
+        self.logger.debug('Silence finished, resuming audio')
+        GLib.source_remove(self.cn_timeout)
+        self.cn_timeout = None
+        self.silence_time += time.time() - self.silence_started
+        self.silence_started = None
+
+    def send_comfort_noise(self):
+        """
+            Send an RFC 3389 comfort noise packet at the current input noise
+            level. These have an SSRC and sequence numbers of their own, as
+            the payloader's can't be shared; receivers consume them before
+            their jitter buffer.
+        """
+        stats = self.encoder.get_by_name('payloader').get_property('stats')
+        while self.cn_ssrc == stats.get_value('ssrc'):
+            self.cn_ssrc = random.getrandbits(32)
+        clock_rate = stats.get_value('clock-rate')
+        cnsrc = self.transport.get_by_name('cnsrc')
+        if cnsrc.get_property('caps') is None:
+            cnsrc.set_property('caps', Gst.Caps.from_string(CN_CAPS % (clock_rate, CN_PAYLOAD_TYPE)))
+        level = int(min(127, max(0, -max(self.rms)))) if self.rms else 127
+        timestamp = stats.get_value('timestamp') + int((time.time() - self.silence_started) * clock_rate)
+        self.cn_seqnum += 1
+        packet = build_cn_packet(self.cn_ssrc, self.cn_seqnum, timestamp, level)
+        cnsrc.emit('push-buffer', Gst.Buffer.new_wrapped(packet))
+        self.cn_bytes += len(packet)
         return True
 
     def get_caps(self):
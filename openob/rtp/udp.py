@@ -0,0 +1,57 @@
+import os
+
+
+def configure_socket(element, buffer_size=0, dscp=-1, multicast_ttl=None, multicast_iface=None):
+    """
+        Apply socket tuning to a udpsrc or udpsink. A buffer_size of 0 and a
+        dscp of -1 leave the operating system defaults alone; DSCP marking,
+        and the multicast TTL, only apply to sending elements.
+    """
+    if buffer_size:
+        # The kernel silently caps this at net.core.rmem_max/wmem_max
+        element.set_property('buffer-size', buffer_size)
+    if dscp >= 0 and element.find_property('qos-dscp') is not None:
+        element.set_property('qos-dscp', dscp)
+    if multicast_ttl is not None and element.find_property('ttl-mc') is not None:
+        element.set_property('ttl-mc', multicast_ttl)
+    if multicast_iface:
+        element.set_property('multicast-iface', multicast_iface)
+
+
+def socket_drops(element):
+    """
+        Return the number of packets the kernel has dropped on a udpsrc's
+        socket, usually because its receive buffer was full, or None if it
+        isn't known (eg the socket isn't open yet, or this isn't Linux).
+    """
+    socket = element.get_property('used-socket')
+    if socket is None:
+        return None
+    inode = os.fstat(socket.get_fd()).st_ino
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path) as f:
+                lines = f.readlines()[1:]
+        except IOError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if int(fields[9]) == inode:
+                return int(fields[-1])
+    return None
+
+
+def udp_counters():
+    """
+        Return the host-wide UDP counters from /proc/net/snmp (eg
+        RcvbufErrors, SndbufErrors) as a dict, or an empty dict if they
+        aren't available.
+    """
+    try:
+        with open('/proc/net/snmp') as f:
+            rows = [line.split() for line in f if line.startswith('Udp:')]
+    except IOError:
+        return {}
+    if len(rows) != 2:
+        return {}
+    return dict(zip(rows[0][1:], [int(value) for value in rows[1][1:]]))
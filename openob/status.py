@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+import time
+from openob.logger import LoggerFactory
+
+# How often each Node publishes its status record, and how long a record
+# survives on the config host if the Node stops publishing it
+STATUS_INTERVAL = 5
+STATUS_TTL = 15
+# Socket timeouts (s) for publishing, so a hung config host can't hold up
+# the publishing thread indefinitely
+STATUS_TIMEOUT = 2
+
+INT_FIELDS = ['packets', 'lost', 'recovered', 'rtx_requests', 'retransmitted', 'jitter_buffer', 'bytes_saved', 'socket_drops', 'rcvbuf_errors', 'sndbuf_errors', 'queue_overruns', 'restarts', 'uptime', 'updated']
+FLOAT_FIELDS = ['drift_ppm', 'drift_correction_ppm', 'alignment_error_ms']
+COLUMNS = [
+    ('link', 'LINK'), ('node', 'NODE'), ('mode', 'MODE'), ('state', 'STATE'),
+    ('caps_hash', 'CAPS'), ('packets', 'PACKETS'), ('lost', 'LOST'), ('recovered', 'RECOVERED'),
+    ('socket_drops', 'DROPS'), ('jitter_buffer', 'JB%'), ('drift_ppm', 'DRIFT'), ('alignment_error_ms', 'ALIGN'),
+    ('levels', 'LEVELS'), ('queues', 'QUEUES%'), ('bytes_saved', 'SAVED'),
+    ('restarts', 'RESTARTS'), ('uptime', 'UPTIME'), ('age', 'AGE'),
+]
+
+
+def caps_hash(caps):
+    """Return a short, stable identifier for a caps string"""
+    if caps is None:
+        return None
+    return hashlib.sha1(caps.encode('utf-8')).hexdigest()[:8]
+
+
+class StatusPublisher(object):
+
+    """
+        Writes a Node's status records to the config host from a thread of
+        its own, so that a slow or unreachable config host never holds up
+        the GLib main loop running the link. Only the newest record is kept
+        while a write is in progress; older ones are simply dropped.
+    """
+
+    def __init__(self, node_name):
+        self.node_name = node_name
+        self.logger = LoggerFactory().getLogger('node.%s.status' % node_name)
+        self.condition = threading.Condition()
+        self.pending = None
+        self.thread = None
+
+    def publish(self, link_config, status):
+        """Queue a status record for link_config's link; returns immediately"""
+        with self.condition:
+            self.pending = (link_config, status)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='status-%s' % self.node_name)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                link_config, status = self.pending
+                self.pending = None
+            try:
+                link_config.publish_status(self.node_name, status, STATUS_TTL)
+            except Exception as e:
+                self.logger.warning("Unable to publish link status: %s" % e)
+
+
+def fetch_statuses(redis, link_name='*'):
+    """
+        Read every published status record (optionally for one link) from the
+        config host. Keys are found with a single SCAN and the records fetched
+        with a single pipeline, so this stays cheap with hundreds of links.
+    """
+    keys = sorted(redis.scan_iter(match='openob:%s:status:*' % link_name, count=1000))
+    pipe = redis.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    now = int(time.time())
+    statuses = []
+    for key, record in zip(keys, pipe.execute()):
+        if not record:
+            # Expired between the scan and the fetch
+            continue
+        link, node = key[len('openob:'):].rsplit(':status:', 1)
+        status = dict(record, link=link, node=node)
+        for field in INT_FIELDS:
+            if status.get(field, '') != '':
+                status[field] = int(status[field])
+        for field in FLOAT_FIELDS:
+            if status.get(field, '') != '':
+                status[field] = float(status[field])
+        if 'updated' in status:
+            status['age'] = now - status['updated']
+        statuses.append(status)
+    return statuses
+
+
+def render_json(statuses):
+    return json.dumps(statuses, indent=2, sort_keys=True)
+
+
+def render_table(statuses):
+    rows = [[title for field, title in COLUMNS]]
+    for status in statuses:
+        rows.append([str(status.get(field, '')) for field, title in COLUMNS])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(COLUMNS))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+        for row in rows
+    )